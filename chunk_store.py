@@ -0,0 +1,158 @@
+"""
+Almacén de chunks direccionado por contenido para snapshots de índices.
+
+Cada snapshot se escribe como un flujo NDJSON (un documento por línea) que se
+corta en chunks definidos por el contenido. Cada chunk se guarda una única vez
+en "snapshots/chunks" con su hash SHA-256 como nombre, y por cada índice se
+escribe un manifiesto pequeño en "snapshots/manifests/<snapshot>/<indice>.json"
+con la lista ordenada de chunks que lo forman.
+
+Los cortes se deciden al final de cada documento a partir de un hash del propio
+documento, por lo que insertar o borrar documentos solo modifica los chunks
+vecinos: en exportaciones repetidas de índices casi sin cambios solo se
+escriben los chunks nuevos.
+"""
+
+import os
+import json
+import zlib
+import hashlib
+import tempfile
+
+# Tamaños por defecto de los chunks (en bytes).
+MIN_CHUNK_SIZE = 256 * 1024
+AVG_CHUNK_SIZE = 1024 * 1024
+MAX_CHUNK_SIZE = 4 * 1024 * 1024
+
+
+class ChunkStore:
+    """Guarda y recupera chunks por su hash SHA-256 dentro de `base_dir`."""
+
+    def __init__(self, base_dir='snapshots'):
+        self.base_dir = base_dir
+        self.chunks_dir = os.path.join(base_dir, 'chunks')
+        self.manifests_dir = os.path.join(base_dir, 'manifests')
+        os.makedirs(self.chunks_dir, exist_ok=True)
+        os.makedirs(self.manifests_dir, exist_ok=True)
+
+    def chunk_path(self, digest):
+        # Se reparten los chunks en subcarpetas para no tener un directorio gigante.
+        return os.path.join(self.chunks_dir, digest[:2], digest)
+
+    def put(self, data):
+        """Guarda un chunk si no existe. Retorna (digest, True si se escribió)."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.chunk_path(digest)
+        if os.path.exists(path):
+            return digest, False
+
+        # Se escribe en un temporal y se renombra para no dejar chunks a medias.
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return digest, True
+
+    def get(self, digest):
+        with open(self.chunk_path(digest), 'rb') as f:
+            return f.read()
+
+    def manifest_path(self, snapshot_id, index):
+        return os.path.join(self.manifests_dir, snapshot_id, f"{index}.json")
+
+    def save_manifest(self, snapshot_id, index, manifest):
+        path = self.manifest_path(snapshot_id, index)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=4)
+        return path
+
+    def load_manifest(self, snapshot_id, index):
+        with open(self.manifest_path(snapshot_id, index), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def iter_snapshot_bytes(self, manifest):
+        """Recorre los chunks de un manifiesto en orden, verificando su hash."""
+        for chunk in manifest['chunks']:
+            data = self.get(chunk['sha256'])
+            if hashlib.sha256(data).hexdigest() != chunk['sha256']:
+                raise ValueError(f"Chunk corrupto: {chunk['sha256']}")
+            yield data
+
+
+class SnapshotWriter:
+    """
+    Recibe documentos de un índice, los serializa como NDJSON y los agrupa en
+    chunks definidos por el contenido que se guardan en un ChunkStore.
+    """
+
+    def __init__(self, store, snapshot_id, index,
+                 min_size=MIN_CHUNK_SIZE, avg_size=AVG_CHUNK_SIZE, max_size=MAX_CHUNK_SIZE):
+        self.store = store
+        self.snapshot_id = snapshot_id
+        self.index = index
+        self.min_size = min_size
+        self.avg_size = avg_size
+        self.max_size = max_size
+        self.buffer = []
+        self.buffer_size = 0
+        self.chunks = []
+        self.doc_count = 0
+        self.total_bytes = 0
+        self.new_chunks = 0
+        self.new_bytes = 0
+
+    def is_boundary(self, line):
+        # La probabilidad de corte es proporcional al largo de la línea, así el
+        # tamaño medio de los chunks se acerca a avg_size sin importar el ancho
+        # de los documentos.
+        if self.buffer_size >= self.max_size:
+            return True
+        if self.buffer_size < self.min_size:
+            return False
+        return zlib.crc32(line) < len(line) * (2 ** 32) // self.avg_size
+
+    def add(self, doc):
+        self.add_line(json.dumps(doc, ensure_ascii=False).encode('utf-8') + b'\n')
+
+    def add_line(self, line):
+        """Agrega un documento ya serializado (una línea NDJSON terminada en salto de línea)."""
+        self.buffer.append(line)
+        self.buffer_size += len(line)
+        self.doc_count += 1
+        if self.is_boundary(line):
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        data = b''.join(self.buffer)
+        digest, written = self.store.put(data)
+        self.chunks.append({'sha256': digest, 'bytes': len(data)})
+        self.total_bytes += len(data)
+        if written:
+            self.new_chunks += 1
+            self.new_bytes += len(data)
+        self.buffer = []
+        self.buffer_size = 0
+
+    def close(self):
+        """Guarda el último chunk y el manifiesto. Retorna la ruta del manifiesto."""
+        self.flush()
+        manifest = {
+            'indice': self.index,
+            'snapshot': self.snapshot_id,
+            'formato': 'ndjson',
+            'documentos': self.doc_count,
+            'bytes': self.total_bytes,
+            'chunks_nuevos': self.new_chunks,
+            'bytes_nuevos': self.new_bytes,
+            'chunks': self.chunks,
+        }
+        return self.store.save_manifest(self.snapshot_id, self.index, manifest)
@@ -0,0 +1,34 @@
+"""
+Checksum de un conjunto de documentos que no depende del orden.
+
+Cada documento aporta el SHA-256 de su "_id" y su "_source" (serializado con las
+claves ordenadas), y los aportes se suman módulo 2^256. Así el mismo valor se
+obtiene al escribir la exportación, en el orden en que llegan las páginas, y al
+recorrer el índice de nuevo en paralelo por slices, combinando los resultados
+parciales con merge().
+"""
+
+import json
+import hashlib
+
+MODULUS = 2 ** 256
+
+
+class DocChecksum:
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+
+    def add(self, doc_id, source):
+        canonical = json.dumps(source, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+        digest = hashlib.sha256(f"{doc_id}\0{canonical}".encode('utf-8')).digest()
+        self.total = (self.total + int.from_bytes(digest, 'big')) % MODULUS
+        self.count += 1
+
+    def merge(self, other):
+        self.total = (self.total + other.total) % MODULUS
+        self.count += other.count
+        return self
+
+    def hexdigest(self):
+        return f"{self.total:064x}"
@@ -0,0 +1,289 @@
+"""
+Cliente HTTP para ElasticSearch que reparte las solicitudes entre varios nodos.
+
+Recibe una lista de hosts semilla y, opcionalmente, descubre el resto de los nodos
+HTTP del cluster con "_nodes/http". Cada solicitud se envía a un nodo elegido por
+turnos ("round_robin") o al que tenga menos solicitudes en curso ("least_loaded").
+Si un nodo no acepta la conexión se marca como caído durante un tiempo y la solicitud
+se reintenta en el siguiente, de modo que el trabajo no depende de un único nodo
+coordinador. Cada solicitud tiene un timeout de conexión y de lectura, así un nodo que
+acepta la conexión pero no responde no bloquea el hilo para siempre.
+
+Opcionalmente limita el ritmo de todas las solicitudes (de todos los hilos) con un
+RateLimiter, y reintenta las solicitudes idempotentes rechazadas por sobrecarga (429,
+502, 503, 504), sin nodos disponibles o sin respuesta dentro del timeout de lectura, con
+espera exponencial con variación aleatoria.
+"""
+
+import time
+import random
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+STRATEGIES = ('round_robin', 'least_loaded')
+
+# Métodos que se reintentan por defecto; un POST se reintenta solo con idempotent=True (p. ej. _search).
+IDEMPOTENT_METHODS = {'GET', 'HEAD'}
+
+# Códigos con los que el cluster indica que la solicitud se puede repetir más tarde.
+RETRYABLE_STATUS = {429, 502, 503, 504}
+
+# Timeout por defecto de cada solicitud: (segundos para conectar, segundos esperando la respuesta).
+DEFAULT_TIMEOUT = (10, 120)
+
+
+class NoAliveNodesError(requests.exceptions.ConnectionError):
+    """Ningún nodo del cluster respondió a la solicitud."""
+
+
+def not_sent(error):
+    """
+    True si el error ocurrió antes de enviar la solicitud (no se pudo conectar), así que
+    se puede repetir en otro nodo sin riesgo. Una conexión cortada o un timeout de lectura
+    pueden ocurrir después de que el nodo procesó la solicitud.
+    """
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    cause = error
+    while cause is not None:
+        # requests envuelve el MaxRetryError de urllib3, cuyo "reason" es el error original.
+        if isinstance(cause, NewConnectionError):
+            return True
+        reason = getattr(cause, 'reason', None)
+        if reason is None and cause.args and isinstance(cause.args[0], BaseException):
+            reason = cause.args[0]
+        cause = reason if reason is not cause else None
+    return False
+
+
+class TokenBucket:
+    """
+    Balde de fichas que se recarga a "rate" fichas por segundo, hasta "capacity".
+
+    reserve() descuenta las fichas aunque no alcancen (el balde queda en deuda) y retorna
+    cuántos segundos hay que esperar para saldarla; así una solicitud grande no queda
+    esperando indefinidamente y el ritmo promedio se respeta.
+    """
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self, amount=1):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+
+class RateLimiter:
+    """
+    Límite de solicitudes por segundo y de bytes por segundo (enviados + recibidos),
+    compartido por todos los hilos que usan el mismo NodePool. None = sin límite.
+    """
+
+    def __init__(self, requests_per_second=None, bytes_per_second=None):
+        self.requests = TokenBucket(requests_per_second) if requests_per_second else None
+        self.bytes = TokenBucket(bytes_per_second) if bytes_per_second else None
+
+    def before_request(self):
+        if self.requests:
+            time.sleep(self.requests.reserve())
+
+    def after_response(self, size):
+        # Los bytes se conocen al terminar; la espera frena la próxima solicitud de este hilo.
+        if self.bytes and size:
+            time.sleep(self.bytes.reserve(size))
+
+
+class NodePool:
+    """
+    Conjunto de nodos de ElasticSearch con balanceo de carga y marcado de nodos caídos.
+
+    Los métodos get/post/put/delete reciben una ruta relativa ("/indice/_search")
+    y los mismos argumentos que requests. Retornan el objeto Response; como con
+    requests, verificar el código de estado queda a cargo de quien llama (tras los
+    reintentos, la última respuesta 429/5xx se retorna igual).
+    """
+
+    def __init__(self, hosts, auth=None, strategy='round_robin', discover=False,
+                 dead_timeout=30, max_dead_timeout=300, timeout=DEFAULT_TIMEOUT, pool_size=10,
+                 rate_limiter=None, retries=0, backoff=0.5, max_backoff=30):
+        if isinstance(hosts, str):
+            hosts = [hosts]
+        if not hosts:
+            raise ValueError("Se necesita al menos un host de ElasticSearch.")
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Estrategia desconocida '{strategy}'. Opciones: {', '.join(STRATEGIES)}.")
+
+        self.strategy = strategy
+        self.dead_timeout = dead_timeout
+        self.max_dead_timeout = max_dead_timeout
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        self.counter = 0
+        self.nodes = []
+
+        # Una sola sesión reutiliza las conexiones TCP hacia cada nodo entre solicitudes.
+        self.session = requests.Session()
+        self.session.auth = auth
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        for host in hosts:
+            self.add_node(host)
+        if discover:
+            self.discover_nodes()
+
+    def add_node(self, url):
+        url = url.rstrip('/')
+        with self.lock:
+            if any(node['url'] == url for node in self.nodes):
+                return
+            self.nodes.append({'url': url, 'in_flight': 0, 'failures': 0, 'dead_until': 0.0})
+
+    @property
+    def hosts(self):
+        return [node['url'] for node in self.nodes]
+
+    def discover_nodes(self):
+        """Agrega los nodos con HTTP habilitado que informa "_nodes/http"."""
+        try:
+            response = self.get('/_nodes/http')
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            logging.warning(f"No se pudieron descubrir los nodos del cluster: {e}")
+            return
+
+        scheme = self.nodes[0]['url'].split('://', 1)[0]
+        for node_info in response.json().get('nodes', {}).values():
+            address = node_info.get('http', {}).get('publish_address')
+            if not address:
+                continue
+            # El formato puede ser "ip:puerto" o "nombre/ip:puerto".
+            address = address.rsplit('/', 1)[-1]
+            self.add_node(f"{scheme}://{address}")
+        logging.info(f"Nodos de ElasticSearch disponibles: {', '.join(self.hosts)}")
+
+    def select_node(self):
+        with self.lock:
+            now = time.monotonic()
+            alive = [node for node in self.nodes if node['dead_until'] <= now]
+            if not alive:
+                # Si todos están caídos se prueba con el que revive primero.
+                alive = [min(self.nodes, key=lambda node: node['dead_until'])]
+
+            self.counter += 1
+            if self.strategy == 'least_loaded':
+                least = min(node['in_flight'] for node in alive)
+                alive = [node for node in alive if node['in_flight'] == least]
+            node = alive[self.counter % len(alive)]
+            node['in_flight'] += 1
+            return node
+
+    def mark_dead(self, node, error):
+        with self.lock:
+            node['failures'] += 1
+            timeout = min(self.dead_timeout * 2 ** (node['failures'] - 1), self.max_dead_timeout)
+            node['dead_until'] = time.monotonic() + timeout
+        logging.warning(f"Nodo '{node['url']}' marcado como caído por {timeout}s: {error}")
+
+    def mark_alive(self, node):
+        if node['failures']:
+            with self.lock:
+                node['failures'] = 0
+                node['dead_until'] = 0.0
+
+    def request(self, method, path, retry_on_timeout=True, idempotent=None, **kwargs):
+        """
+        Envía la solicitud a un nodo; si no se puede conectar la reintenta en otro.
+
+        Las solicitudes idempotentes (GET/HEAD, o idempotent=True) se reintentan hasta
+        "retries" veces con espera exponencial si el cluster responde 429/502/503/504,
+        ningún nodo acepta la conexión, o el nodo tarda más que el timeout de lectura o
+        corta la conexión (sin marcarlo como caído: puede estar vivo pero ocupado). Con
+        retry_on_timeout=False solo se reintentan los casos en que la solicitud no llegó a
+        procesarse (429 y errores al conectar): un timeout de lectura o una conexión cortada
+        se informan como error, porque el nodo pudo haber procesado la solicitud (p. ej.
+        avanzar un scroll, o un _bulk sin _id).
+        """
+        if idempotent is None:
+            idempotent = method in IDEMPOTENT_METHODS
+        retries = self.retries if idempotent else 0
+        retry_status = RETRYABLE_STATUS if retry_on_timeout else {429}
+        for attempt in range(retries + 1):
+            try:
+                response = self.send(method, path, **kwargs)
+            except NoAliveNodesError as e:
+                if attempt == retries:
+                    raise
+                error = e
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                # Timeout de lectura o conexión cortada después de enviar la solicitud
+                if not retry_on_timeout or attempt == retries:
+                    raise
+                error = e
+            else:
+                if response.status_code not in retry_status or attempt == retries:
+                    return response
+                error = f"HTTP {response.status_code}"
+            # Espera exponencial con variación aleatoria para no reintentar todos a la vez.
+            delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+            logging.warning(f"{method} {path} falló ({error}); reintento {attempt + 1} de {retries} en {delay:.1f}s.")
+            time.sleep(delay)
+
+    def send(self, method, path, **kwargs):
+        """
+        Envía la solicitud una vez, probando los nodos vivos hasta que uno acepte la conexión.
+        Un error posterior al envío (timeout de lectura, conexión cortada) se lanza sin marcar
+        el nodo como caído ni reenviar la solicitud a otro nodo: un nodo lento no está caído, y
+        repetir una solicitud pesada en todos los nodos los sobrecargaría.
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        last_error = None
+        for _ in range(len(self.nodes)):
+            if self.rate_limiter:
+                self.rate_limiter.before_request()
+            node = self.select_node()
+            try:
+                response = self.session.request(method, f"{node['url']}{path}", **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if not not_sent(e):
+                    raise
+                last_error = e
+                self.mark_dead(node, e)
+                continue
+            finally:
+                with self.lock:
+                    node['in_flight'] -= 1
+            self.mark_alive(node)
+            if self.rate_limiter:
+                sent = kwargs.get('data')
+                self.rate_limiter.after_response(len(response.content) + (len(sent) if isinstance(sent, (bytes, str)) else 0))
+            return response
+        raise NoAliveNodesError(f"Ningún nodo respondió a {method} {path}: {last_error}")
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request('POST', path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request('PUT', path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request('DELETE', path, **kwargs)
@@ -5,17 +5,200 @@ Se solicitan credenciales por consola y el/los nombre/s de los índices
 que se quieren obtener. En el caso de necesitarvarios índices, se separan con coma.
 Se guarda un archivo log con los resultados.
 
-Completar en línea 32"es_host" la dirección de la bbdd elastic junto con el puerto.
+Opcionalmente se puede exportar solo una parte de cada índice. El filtro se aplica
+en el servidor (en la consulta de scroll) y queda registrado en "<indice>.manifest.json":
+  --query '{"term": {"tenant": "acme"}}'          consulta DSL para todos los índices
+  --campo-fecha @timestamp --desde now-1d          rango de fechas (--hasta opcional)
+  --filtro tenant=acme                             igualdad sobre un campo (repetible)
+  --trabajo trabajo.json                           filtros por índice desde un archivo
+
+Con "--particionar CAMPO_FECHA" cada índice se divide en rangos de tiempo con cantidades de
+documentos parecidas (según un date_histogram) que se exportan en paralelo a
+"<indice>/dt=AAAA-MM-DD/part-NNNN.<formato>". Con "--dias" se vuelven a exportar solo
+esos días. Con "--memoria-mb" las partes se achican según el ancho de los documentos y
+cada una empieza solo cuando hay lugar para ella en el presupuesto.
+
+Con "--seguir" el script queda corriendo y, cada "--intervalo-segundos", trae de cada índice
+solo los documentos posteriores al último visto (orden "--campo-orden", con "--retraso-segundos"
+de margen para los que tardan en ser visibles), que se agregan a
+"seguimiento/<indice>/hora=AAAAMMDD-HH/part-NNNN.ndjson". La posición se guarda en
+"seguimiento/<indice>/_cursor.json" para continuar después de reiniciar.
+
+Además de índices se pueden pedir alias, data streams y patrones ("logs-*"): se resuelven con
+"_resolve/index" y cada índice concreto se exporta una sola vez, aunque lo incluyan varios
+de los nombres pedidos (con la unión de sus filtros). El filtro de un alias filtrado se
+aplica a sus índices; los alias con routing se rechazan. Los patrones no incluyen índices ocultos ni de sistema, salvo con
+"--incluir-ocultos".
+
+Con "--transformar modulo:funcion" cada documento pasa por esa función antes de guardarse,
+en un pool de procesos ("--procesos"), manteniendo el orden de los documentos.
+
+Con "--formato ndjson" se guarda "<indice>.ndjson" (un documento por línea) y, con
+"--indice-offsets", además "<indice>.offsets.sqlite" para buscar documentos por _id
+con etlBuscar.py sin leer todo el archivo.
+
+Completar en la variable "es_hosts" la dirección de la bbdd elastic junto con el puerto.
 
 """
 
 
+import os
 import json
+import math
+import time
+import shutil
+import argparse
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import quote
 import requests
 from requests.auth import HTTPBasicAuth
 import logging
 import sys
+import sqlite3
 import getpass
+from es_client import NodePool, RateLimiter
+from offset_index import OffsetIndexWriter
+from profiling import PhaseProfiler
+from transform import TransformPool, TransformError, load_function
+from index_cache import index_names
+from memory_budget import MemoryBudget, Reservation, measure_doc_bytes, MEMORY_FACTOR
+
+# Opciones de línea de comandos. Se leen antes de pedir credenciales para que "--help" no las solicite.
+parser = argparse.ArgumentParser(description="Exporta uno o varios índices de ElasticSearch a JSON.")
+parser.add_argument('--query', help="Consulta DSL (JSON) que se aplica a todos los índices.")
+parser.add_argument('--campo-fecha', help="Campo de fecha sobre el que se aplica --desde/--hasta.")
+parser.add_argument('--desde', help="Inicio del rango de fechas (incluido), p. ej. 2024-05-01 o now-1d.")
+parser.add_argument('--hasta', help="Fin del rango de fechas (excluido).")
+parser.add_argument('--filtro', action='append', default=[], metavar='CAMPO=VALOR',
+                    help="Exporta solo documentos con CAMPO igual a VALOR. Se puede repetir.")
+parser.add_argument('--trabajo', help="Archivo JSON con los índices a exportar y el filtro de cada uno.")
+parser.add_argument('--formato', choices=['json', 'ndjson'],
+                    help="'json' (por defecto) guarda un arreglo JSON; 'ndjson' guarda un documento por línea.")
+parser.add_argument('--incluir-id', action='store_true',
+                    help="Agrega el _id de cada documento como campo \"_id\" (para restaurarlo con etlRestaurar.py).")
+parser.add_argument('--incluir-ocultos', action='store_true',
+                    help="Los patrones (p. ej. 'logs-*') incluyen también índices, alias y data streams ocultos o de sistema.")
+parser.add_argument('--particionar', metavar='CAMPO_FECHA',
+                    help="Exporta cada índice en particiones diarias <indice>/dt=AAAA-MM-DD/ en paralelo.")
+parser.add_argument('--workers', type=int, default=4, help="Rangos de tiempo que se exportan en paralelo (--particionar).")
+parser.add_argument('--docs-por-parte', type=int,
+                    help="Documentos aproximados por archivo de parte (--particionar). Por defecto se reparte el "
+                         "índice en unas 4 partes por worker.")
+parser.add_argument('--intervalo-horas', type=int, default=1, choices=[1, 2, 3, 4, 6, 8, 12, 24],
+                    help="Resolución del date_histogram usado para dividir cada día en partes (--particionar).")
+parser.add_argument('--memoria-mb', type=float, metavar='MB',
+                    help="Con --particionar, presupuesto de memoria de las partes que se exportan en paralelo (por defecto sin límite).")
+parser.add_argument('--dias', help="Con --particionar, exporta solo estos días (AAAA-MM-DD separados por coma).")
+parser.add_argument('--seguir', action='store_true',
+                    help="Queda corriendo y agrega los documentos nuevos de cada índice a seguimiento/<indice>/.")
+parser.add_argument('--campo-orden', default='@timestamp',
+                    help="Campo del documento con el que se ordenan los documentos nuevos en --seguir.")
+parser.add_argument('--desempate', default='',
+                    help="Campo único del documento para desempatar el orden de --seguir. Sin él, los documentos con "
+                         "el mismo valor de --campo-orden se distinguen por _id.")
+parser.add_argument('--intervalo-segundos', type=float, default=10,
+                    help="Espera entre consultas cuando no hay documentos nuevos (--seguir).")
+parser.add_argument('--retraso-segundos', type=int, default=60,
+                    help="Con --seguir, solo trae documentos con --campo-orden anterior a ahora menos estos segundos, "
+                         "para no saltear los que todavía se están indexando.")
+parser.add_argument('--desde-ahora', action='store_true',
+                    help="Con --seguir y sin cursor guardado, empieza por los documentos nuevos en lugar del principio.")
+parser.add_argument('--rotar-mb', type=float, default=256,
+                    help="Con --seguir, tamaño a partir del cual se empieza un archivo nuevo dentro de la misma hora.")
+parser.add_argument('--profile', action='store_true',
+                    help="Mide tiempo y memoria por fase (connect, fetch, decode, transform, serialize, write).")
+parser.add_argument('--indice-offsets', action='store_true',
+                    help="Con --formato ndjson, guarda <indice>.offsets.sqlite (_id -> posición en el archivo).")
+parser.add_argument('--max-solicitudes', type=float, metavar='N',
+                    help="Máximo de solicitudes por segundo al cluster, entre todos los hilos (por defecto sin límite).")
+parser.add_argument('--max-mb-segundo', type=float, metavar='MB',
+                    help="Máximo de MB por segundo transferidos con el cluster, entre todos los hilos (por defecto sin límite).")
+parser.add_argument('--reintentos', type=int, default=5,
+                    help="Reintentos de las lecturas rechazadas por sobrecarga (429/5xx) o sin nodos disponibles.")
+parser.add_argument('--timeout-conexion', type=float, default=10, metavar='SEGUNDOS',
+                    help="Segundos para conectar con un nodo antes de probar el siguiente.")
+parser.add_argument('--timeout-lectura', type=float, default=120, metavar='SEGUNDOS',
+                    help="Segundos esperando la respuesta de un nodo antes de considerar fallida la solicitud.")
+parser.add_argument('--transformar', metavar='MODULO:FUNCION',
+                    help="Aplica la función a cada documento antes de guardarlo, en un pool de procesos (None lo descarta).")
+parser.add_argument('--procesos', type=int, help="Procesos del pool de --transformar (por defecto, la cantidad de núcleos).")
+args = parser.parse_args()
+
+# Claves admitidas en el filtro de cada índice de un archivo de trabajo
+JOB_FILTER_KEYS = {'query', 'campo_fecha', 'desde', 'hasta', 'filtros'}
+
+# Verificar el filtro de un índice del archivo de trabajo. Retorna el problema encontrado o None
+def validate_job_filter(filtro):
+    if not isinstance(filtro, dict):
+        return "el filtro debe ser un objeto JSON"
+    unknown = set(filtro) - JOB_FILTER_KEYS
+    if unknown:
+        return f"claves desconocidas {sorted(unknown)} (se admiten {sorted(JOB_FILTER_KEYS)})"
+    if filtro.get('query') is not None and not isinstance(filtro['query'], dict):
+        return "\"query\" debe ser un objeto JSON con una consulta DSL"
+    if filtro.get('query') and (filtro.get('campo_fecha') or filtro.get('filtros')):
+        return "\"query\" no se puede combinar con \"campo_fecha\" ni \"filtros\""
+    if filtro.get('filtros') is not None and not isinstance(filtro['filtros'], dict):
+        return "\"filtros\" debe ser un objeto {\"campo\": valor}"
+    if (filtro.get('desde') or filtro.get('hasta')) and not filtro.get('campo_fecha'):
+        return "\"desde\"/\"hasta\" requieren \"campo_fecha\""
+    if filtro.get('campo_fecha') and not (filtro.get('desde') or filtro.get('hasta')):
+        return "\"campo_fecha\" requiere \"desde\" o \"hasta\""
+    return None
+
+if (args.desde or args.hasta) and not args.campo_fecha:
+    parser.error("--desde/--hasta requieren --campo-fecha.")
+if args.campo_fecha and not (args.desde or args.hasta):
+    parser.error("--campo-fecha requiere --desde o --hasta.")
+if args.query and (args.campo_fecha or args.filtro):
+    parser.error("--query no se puede combinar con --campo-fecha ni --filtro.")
+if args.trabajo and (args.query or args.filtro or args.campo_fecha):
+    parser.error("--trabajo no se puede combinar con --query, --filtro ni --campo-fecha: los filtros se leen del archivo.")
+if args.query:
+    try:
+        if not isinstance(json.loads(args.query), dict):
+            parser.error("--query debe ser un objeto JSON con una consulta DSL.")
+    except ValueError as e:
+        parser.error(f"--query no es un JSON válido: {e}")
+if args.filtro and not all('=' in item for item in args.filtro):
+    parser.error("--filtro debe tener la forma CAMPO=VALOR.")
+# El archivo de trabajo se lee y se verifica antes de pedir las credenciales: {"indice": {filtro}, ...}
+job_filters = None
+if args.trabajo:
+    try:
+        with open(args.trabajo, 'r', encoding='utf-8') as f:
+            job_filters = json.load(f)
+    except (IOError, ValueError) as e:
+        parser.error(f"No se pudo leer el archivo de trabajo '{args.trabajo}': {e}")
+    if not isinstance(job_filters, dict) or not job_filters:
+        parser.error(f"El archivo de trabajo '{args.trabajo}' debe ser un objeto JSON {{\"indice\": {{filtro}}, ...}} con al menos un índice.")
+    for job_index, job_filter in job_filters.items():
+        problem = validate_job_filter(job_filter)
+        if problem:
+            parser.error(f"Archivo de trabajo '{args.trabajo}', índice '{job_index}': {problem}.")
+if args.dias and not args.particionar:
+    parser.error("--dias requiere --particionar.")
+if args.memoria_mb and not args.particionar:
+    parser.error("--memoria-mb requiere --particionar.")
+if args.seguir and args.particionar:
+    parser.error("--seguir no se puede combinar con --particionar.")
+if args.campo_orden.startswith('_') or args.desempate.startswith('_'):
+    # _seq_no y los demás metadatos no son crecientes ni únicos en todo el índice (solo dentro de cada shard)
+    parser.error("--campo-orden y --desempate deben ser campos del documento, no metadatos como _seq_no.")
+if args.seguir and (args.formato == 'json' or args.indice_offsets):
+    # --seguir agrega siempre NDJSON a archivos que siguen creciendo, sin índice de offsets
+    parser.error("--seguir guarda siempre NDJSON: no se puede combinar con --formato json ni --indice-offsets.")
+if args.indice_offsets and args.formato != 'ndjson':
+    parser.error("--indice-offsets requiere --formato ndjson.")
+args.formato = args.formato or 'json'
+if args.transformar:
+    try:
+        load_function(args.transformar)
+    except (ImportError, ValueError) as e:
+        parser.error(f"No se pudo cargar la transformación '{args.transformar}': {e}")
 
 # Configurar logging con formato UTF-8
 logging.basicConfig(
@@ -28,18 +211,22 @@ logging.basicConfig(
 input_user = input("Ingrese el usuario: ")
 input_password = getpass.getpass("Ingrese la contraseña: ")  # Ocultar la entrada de la contraseña
 
+# Perfilado por fases (--profile). Empieza después de pedir las credenciales
+profiler = PhaseProfiler(args.profile)
+profiler.start()
+
 # Configuración para ElasticSearch
-es_host = "http://TU_SERVIDOR:9200"
+es_hosts = ["http://TU_SERVIDOR:9200"]  # Uno o más nodos semilla del cluster.
+discover_nodes = False  # Si es True, se agregan los demás nodos HTTP informados por "_nodes/http".
+node_strategy = "round_robin"  # Reparto de solicitudes entre nodos: "round_robin" o "least_loaded".
 batch_size = 1000
+indices_cache_ttl = 300  # Segundos que se reutiliza el listado de índices de la carpeta "cache" (0 = consultar siempre).
 
 # Verificar si el usuario y la contraseña ingresados son válidos contra el host de ElasticSearch
-def validate_user_credentials(es_host, input_user, input_password):
+def validate_user_credentials(es):
     try:
         # Realiza una solicitud GET al endpoint raíz de Elasticsearch
-        response = requests.get(
-            es_host,
-            auth=HTTPBasicAuth(input_user, input_password)
-        )
+        response = es.get('/')
         # Si la respuesta es 200 OK, las credenciales son válidas
         if response.status_code == 200:
             return True
@@ -50,61 +237,686 @@ def validate_user_credentials(es_host, input_user, input_password):
         return False
 
 # Validar las credenciales del usuario
-if not validate_user_credentials(es_host, input_user, input_password):
+with profiler.phase('connect'):
+    # El límite de ritmo es uno solo para todos los hilos de --particionar
+    rate_limiter = RateLimiter(args.max_solicitudes, args.max_mb_segundo and args.max_mb_segundo * 1024 * 1024)
+    es = NodePool(es_hosts, auth=HTTPBasicAuth(input_user, input_password), strategy=node_strategy,
+                  pool_size=max(10, args.workers), rate_limiter=rate_limiter, retries=args.reintentos,
+                  timeout=(args.timeout_conexion, args.timeout_lectura))
+    credentials_ok = validate_user_credentials(es)
+    if credentials_ok and discover_nodes:
+        es.discover_nodes()
+if not credentials_ok:
     print("Usuario o contraseña incorrectos.")
     sys.exit(1)
 
+# Presupuesto de memoria de las partes en paralelo (--memoria-mb)
+memory_budget = MemoryBudget(args.memoria_mb * 1024 * 1024 if args.memoria_mb else None)
+
+# Pool de procesos de --transformar. Se crea antes de los hilos de --particionar
+transform_pool = TransformPool(args.transformar, args.procesos) if args.transformar else None
+
 # Obtener lista de índices de ElasticSearch
+# Retorna un conjunto, para comprobar si existe cada índice pedido sin recorrer la lista
 def get_indices_from_elasticsearch():
     try:
-        response = requests.get(
-            f"{es_host}/_cat/indices?format=json",
-            auth=HTTPBasicAuth(input_user, input_password)
-        )
-        response.raise_for_status()
-        indices = [index['index'] for index in response.json()]
-        return indices
+        return index_names(es, ttl=indices_cache_ttl)
     except requests.RequestException as e:
         logging.error(f"Error al obtener la lista de índices de Elasticsearch: {e}")
+        return set()
+
+# Filtros de un alias por índice ({índice: filtro o None}). Un alias con routing solo ve
+# algunos shards, lo que no se puede reproducir exportando el índice: se rechaza
+def alias_filters(alias):
+    response = es.get(f"/_alias/{quote(alias, safe=',-')}")
+    response.raise_for_status()
+    filters = {}
+    for index, info in response.json().items():
+        definition = info.get('aliases', {}).get(alias, {})
+        if definition.get('search_routing') or definition.get('routing'):
+            raise ValueError(f"El alias '{alias}' usa routing; exporte sus índices por nombre con un filtro.")
+        filters[index] = definition.get('filter')
+    return filters
+
+# Resolver un alias, data stream o patrón a los índices concretos (abiertos) que abarca.
+# Retorna [(índice, filtro del alias o None)]: el filtro de un alias se respeta al exportar
+def resolve_index_name(name):
+    expand_wildcards = 'open,hidden' if args.incluir_ocultos else 'open'
+    response = es.get(f"/_resolve/index/{quote(name, safe=',*-')}?expand_wildcards={expand_wildcards}")
+    if response.status_code == 404:
         return []
+    response.raise_for_status()
+    result = response.json()
 
-# Conectar a ElasticSearch y extraer datos
-def fetch_data_from_elasticsearch(index):
-    data = []
-    scroll_id = None
+    concrete = [(index['name'], None) for index in result.get('indices', []) if 'closed' not in index.get('attributes', [])]
+    for alias in result.get('aliases', []):
+        filters = alias_filters(alias['name'])
+        concrete.extend((index, filters.get(index)) for index in alias.get('indices', []))
+    for data_stream in result.get('data_streams', []):
+        concrete.extend((index, None) for index in data_stream.get('backing_indices', []))
+    return concrete
 
-    while True:
+# Consulta que exige las dos condiciones (None = sin condición)
+def and_queries(query, other):
+    if query and other:
+        return {'bool': {'filter': [query, other]}}
+    return query or other
+
+# Consulta que acepta los documentos de cualquiera de las consultas (None = todos los documentos)
+def or_queries(queries):
+    if any(query is None for query in queries):
+        return None
+    unique = list({json.dumps(query, sort_keys=True): query for query in queries}.values())
+    if len(unique) == 1:
+        return unique[0]
+    return {'bool': {'should': unique, 'minimum_should_match': 1}}
+
+# Armar la lista de índices concretos a exportar, cada uno una sola vez. Retorna
+# {índice concreto: consulta}, en el orden en que se pidieron. Si varios nombres abarcan el
+# mismo índice con filtros distintos, se exporta la unión (OR) de sus filtros. Con report=False
+# solo se registran los errores (para volver a resolver los nombres de --seguir en cada ciclo)
+def plan_concrete_indices(names, es_indices, filters_by_index, report=True):
+    queries = {}
+    for name in names:
         try:
-            url = f"{es_host}/{index}/_search?scroll=1m&size={batch_size}"
-            if scroll_id:
-                url = f"{es_host}/_search/scroll?scroll=1m&scroll_id={scroll_id}"
-
-            response = requests.get(
-                url,
-                auth=HTTPBasicAuth(input_user, input_password)
-            )
+            # Un índice concreto está en el listado; el resto (alias, data streams, patrones) se resuelve
+            concrete = [(name, None)] if name in es_indices else resolve_index_name(name)
+        except (requests.RequestException, ValueError) as e:
+            print(f"Error al resolver '{name}': {e}")
+            logging.error(f"Error al resolver '{name}': {e}")
+            continue
+        if not concrete:
+            if report:
+                print(f"Índice '{name}' no encontrado en Elasticsearch.")
+                logging.warning(f"Índice '{name}' no encontrado en Elasticsearch.")
+            continue
+        if report and [index for index, _ in concrete] != [name]:
+            print(f"'{name}' abarca {len(concrete)} índices: {', '.join(index for index, _ in concrete)}.")
+            logging.info(f"'{name}' abarca {len(concrete)} índices: {', '.join(index for index, _ in concrete)}.")
+
+        query = build_query(filters_by_index.get(name))
+        for index, alias_filter in concrete:
+            queries.setdefault(index, []).append(and_queries(query, alias_filter))
+
+    targets = {}
+    for index, index_queries in queries.items():
+        if len(index_queries) > 1:
+            # Lo incluyen varios nombres: se lee una sola vez, con los documentos de todos ellos
+            logging.info(f"Índice '{index}' incluido por {len(index_queries)} nombres; se exporta la unión de sus filtros.")
+        targets[index] = or_queries(index_queries)
+        if report:
+            print(f"Índice '{index}' encontrado en Elasticsearch.")
+            logging.info(f"Índice '{index}' encontrado en Elasticsearch.")
+    return targets
+
+# Armar el filtro de un índice a partir de las opciones de línea de comandos
+def filter_from_args(args):
+    filtro = {}
+    if args.query:
+        filtro['query'] = json.loads(args.query)
+    if args.campo_fecha:
+        filtro['campo_fecha'] = args.campo_fecha
+        filtro['desde'] = args.desde
+        filtro['hasta'] = args.hasta
+    if args.filtro:
+        filtro['filtros'] = dict(item.split('=', 1) for item in args.filtro)
+    return filtro
+
+# Convertir un filtro ({"query": ...} o {"campo_fecha", "desde", "hasta", "filtros"})
+# en la consulta DSL que se envía a ElasticSearch. Retorna None si no hay filtro.
+def build_query(filtro):
+    if not filtro:
+        return None
+    if filtro.get('query'):
+        return filtro['query']
+
+    clauses = []
+    if filtro.get('campo_fecha'):
+        date_range = {}
+        if filtro.get('desde'):
+            date_range['gte'] = filtro['desde']
+        if filtro.get('hasta'):
+            date_range['lt'] = filtro['hasta']
+        clauses.append({'range': {filtro['campo_fecha']: date_range}})
+    for campo, valor in (filtro.get('filtros') or {}).items():
+        clauses.append({'term': {campo: valor}})
+    return {'bool': {'filter': clauses}} if clauses else None
+
+# Documento tal como se guarda en el archivo: el _source y, con --incluir-id, su _id
+def export_doc(doc):
+    if args.incluir_id:
+        return {'_id': doc['_id'], **doc['_source']}
+    return doc['_source']
+
+# Recorrer las páginas a medida que llegan, retornando (página, documentos a guardar).
+# Con --transformar las páginas pasan en orden por el pool de procesos mientras se siguen
+# leyendo las siguientes; los documentos descartados por la transformación quedan como None
+def export_pages(pages):
+    sent = deque()  # Páginas enviadas al pool, para emparejarlas con sus resultados
+
+    def batches():
+        for page in pages:
+            sent.append(page)
+            with profiler.phase('transform'):
+                docs = [export_doc(doc) for doc in page]
+            yield docs
+
+    for docs in transform_pool.map(batches(), profiler.phase('transform')) if transform_pool else batches():
+        yield sent.popleft(), docs
+
+# Guardar los documentos en un arreglo JSON, escribiendo el texto por bloques. Retorna cuántos se guardaron
+def save_json(json_file, pages):
+    docs = [doc for _, page_docs in export_pages(pages) for doc in page_docs if doc is not None]
+    chunks = json.JSONEncoder(ensure_ascii=False, indent=4).iterencode(docs)
+    with open(json_file, 'w', encoding='utf-8') as f:
+        while True:
+            with profiler.phase('serialize'):
+                text = ''.join(itertools.islice(chunks, 4096))
+            if not text:
+                break
+            with profiler.phase('write'):
+                f.write(text)
+    return len(docs)
+
+# Guardar los documentos como NDJSON y, opcionalmente, el índice de offsets por _id. Retorna cuántos se guardaron.
+# El índice de offsets apunta a "indexed_file" (por defecto ndjson_file), el nombre final del archivo
+def save_ndjson(ndjson_file, pages, offsets_file=None, indexed_file=None):
+    offsets = OffsetIndexWriter(offsets_file) if offsets_file else None
+    written = 0
+    try:
+        with open(ndjson_file, 'wb') as f:
+            offset = 0
+            for page, docs in export_pages(pages):
+                if transform_pool:
+                    kept = [(doc, exported) for doc, exported in zip(page, docs) if exported is not None]
+                    page, docs = [doc for doc, _ in kept], [exported for _, exported in kept]
+                with profiler.phase('serialize'):
+                    lines = [json.dumps(doc, ensure_ascii=False).encode('utf-8') + b'\n' for doc in docs]
+                with profiler.phase('write'):
+                    f.write(b''.join(lines))
+                if offsets:
+                    with profiler.phase('offsets'):
+                        for doc, line in zip(page, lines):
+                            offsets.add(doc['_id'], indexed_file or ndjson_file, offset, len(line) - 1)
+                            offset += len(line)
+                written += len(lines)
+    finally:
+        if offsets:
+            offsets.close()
+    return written
+
+# Recorrer con scroll todos los documentos que cumplen la consulta, retornando cada página al llegar
+def scroll_pages(index, query=None, page_size=None):
+    scroll_id = None
+
+    try:
+        while True:
+            with profiler.phase('fetch'):
+                if scroll_id:
+                    # Avanzar el scroll no es idempotente: tras un timeout no se reintenta
+                    response = es.get(f"/_search/scroll?scroll=1m&scroll_id={scroll_id}", retry_on_timeout=False)
+                else:
+                    # La primera página lleva la consulta, así el filtro se aplica en el servidor
+                    response = es.post(
+                        f"/{index}/_search?scroll=1m&size={page_size or batch_size}",
+                        json={'query': query} if query else None,
+                        idempotent=True
+                    )
             response.raise_for_status()
 
-            result = response.json()
+            with profiler.phase('decode'):
+                result = response.json()
             scroll_id = result.get('_scroll_id')
             hits = result['hits']['hits']
             if not hits:
                 break
+            yield hits
+    finally:
+        # Liberar el contexto de scroll en el servidor, también si falló una página
+        if scroll_id:
+            try:
+                es.delete('/_search/scroll', json={'scroll_id': scroll_id})
+            except requests.RequestException:
+                pass
 
-            data.extend(hits)
-        except requests.RequestException as e:
-            logging.error(f"Error al recuperar datos del índice '{index}': {e}")
-            return
+# Guardar los documentos en el formato elegido (json o ndjson) a medida que se leen. Retorna cuántos se guardaron.
+# Se escribe en temporales que reemplazan a los archivos al terminar: si falla la lectura o la
+# transformación a mitad del índice, quedan los archivos de la exportación anterior
+def save_documents(output_file, pages, offsets_file=None):
+    tmp_file = f"{output_file}.tmp"
+    tmp_offsets = f"{offsets_file}.tmp" if offsets_file else None
+    try:
+        if args.formato == 'ndjson':
+            written = save_ndjson(tmp_file, pages, tmp_offsets, output_file)
+        else:
+            written = save_json(tmp_file, pages)
+        os.replace(tmp_file, output_file)
+        if tmp_offsets:
+            os.replace(tmp_offsets, offsets_file)
+        return written
+    finally:
+        for leftover in (tmp_file, tmp_offsets):
+            if leftover and os.path.exists(leftover):
+                os.remove(leftover)
 
-    # Guardar datos en formato JSON
-    json_file = f"{index}.json"
+# Conectar a ElasticSearch y extraer datos
+def fetch_data_from_elasticsearch(index, query=None):
+    # Guardar datos en el formato elegido
+    json_file = f"{index}.{args.formato}"
+    pages = scroll_pages(index, query)
     try:
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump([doc['_source'] for doc in data], f, ensure_ascii=False, indent=4)
+        written = save_documents(json_file, pages, f"{index}.offsets.sqlite" if args.indice_offsets else None)
         print(f"Datos del índice '{index}' guardados en '{json_file}'.")
         logging.info(f"Datos del índice '{index}' guardados en '{json_file}'.")
-    except IOError as e:
+    except requests.RequestException as e:
+        logging.error(f"Error al recuperar datos del índice '{index}': {e}")
+        return
+    except (IOError, sqlite3.Error) as e:
         logging.error(f"Error al guardar el archivo JSON para el índice '{index}': {e}")
+        return
+    except TransformError as e:
+        # Un error de la función de --transformar hace fallar solo este índice
+        print(f"Error al transformar los documentos del índice '{index}': {e}")
+        logging.error(f"Error al transformar los documentos del índice '{index}': {e}")
+        return
+    finally:
+        pages.close()  # Libera el contexto de scroll si la escritura se cortó
+
+    # Registrar qué parte del índice se exportó
+    manifest_file = f"{index}.manifest.json"
+    manifest = {
+        'indice': index,
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'query': query,
+        'documentos': written,
+        'archivo': json_file,
+    }
+    try:
+        with open(manifest_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=4)
+    except IOError as e:
+        logging.error(f"Error al guardar el manifiesto del índice '{index}': {e}")
+
+# Nombre de la partición sin fecha, como en Hive
+MISSING_DATE_PARTITION = '__HIVE_DEFAULT_PARTITION__'
+
+# Dividir un índice en rangos de tiempo que no cruzan días y tienen cantidades de documentos
+# parecidas, usando un date_histogram. Retorna (lista de partes, documentos sin fecha)
+def plan_time_partitions(index, field, query=None, doc_bytes=0):
+    interval_ms = args.intervalo_horas * 3600 * 1000
+    body = {
+        'size': 0,
+        'aggs': {
+            'rangos': {'date_histogram': {'field': field, 'fixed_interval': f"{args.intervalo_horas}h", 'min_doc_count': 1}},
+            'sin_fecha': {'missing': {'field': field}},
+        },
+    }
+    if query:
+        body['query'] = query
+    response = es.post(f"/{index}/_search", json=body, idempotent=True)
+    response.raise_for_status()
+    aggregations = response.json()['aggregations']
+    buckets = aggregations['rangos']['buckets']
+
+    total = sum(bucket['doc_count'] for bucket in buckets)
+    target = args.docs_por_parte or max(batch_size, math.ceil(total / (args.workers * 4)))
+    if memory_budget.limit and doc_bytes:
+        # Cada parte queda completa en memoria hasta escribirla: deben entrar --workers partes en el presupuesto
+        target = min(target, max(1, int(memory_budget.limit / args.workers / (doc_bytes * MEMORY_FACTOR))))
+
+    parts = []
+    current = None
+    for bucket in buckets:
+        day = datetime.fromtimestamp(bucket['key'] / 1000, tz=timezone.utc).strftime('%Y-%m-%d')
+        # Se cierra la parte al cambiar de día o al llegar a la cantidad buscada.
+        if current and (current['dt'] != day or current['documentos'] >= target):
+            parts.append(current)
+            current = None
+        if current is None:
+            current = {'dt': day, 'desde': bucket['key'], 'documentos': 0}
+        current['hasta'] = bucket['key'] + interval_ms
+        current['documentos'] += bucket['doc_count']
+    if current:
+        parts.append(current)
+
+    # Numerar las partes de cada día
+    numbers = {}
+    for part in parts:
+        part['parte'] = numbers.get(part['dt'], 0)
+        numbers[part['dt']] = part['parte'] + 1
+    return parts, aggregations['sin_fecha']['doc_count']
+
+# Exportar una parte (rango de tiempo) a <indice>/dt=AAAA-MM-DD/part-NNNN.<formato>
+def export_partition(index, field, part, day_dir, query=None, doc_bytes=0):
+    if part['dt'] == MISSING_DATE_PARTITION:
+        clauses = {'must_not': [{'exists': {'field': field}}]}
+    else:
+        clauses = {'filter': [{'range': {field: {'gte': part['desde'], 'lt': part['hasta'], 'format': 'epoch_millis'}}}]}
+    if query:
+        clauses.setdefault('filter', []).append(query)
+
+    # Con --formato json la parte queda completa en memoria hasta escribirla (con ndjson, a lo sumo):
+    # se reserva antes de empezar a leerla
+    reservation = Reservation(memory_budget)
+    reservation.acquire(part['documentos'] * doc_bytes * MEMORY_FACTOR)
+    page_size = memory_budget.page_size(doc_bytes, batch_size, workers=args.workers)
+    pages = scroll_pages(index, {'bool': clauses}, page_size)
+    try:
+        part_file = os.path.join(day_dir, f"part-{part['parte']:04d}.{args.formato}")
+        offsets_file = f"{part_file[:-len(args.formato) - 1]}.offsets.sqlite" if args.indice_offsets else None
+        return part_file, save_documents(part_file, pages, offsets_file)
+    finally:
+        pages.close()
+        reservation.release()
+
+# Exportar un índice en particiones diarias, con varios rangos de tiempo en paralelo
+def export_partitioned(index, field, query=None):
+    try:
+        doc_bytes = measure_doc_bytes(es, index, query) if memory_budget.limit else 0
+        parts, missing = plan_time_partitions(index, field, query, doc_bytes)
+    except requests.RequestException as e:
+        logging.error(f"Error al dividir el índice '{index}' por '{field}': {e}")
+        return
+    if missing:
+        parts.append({'dt': MISSING_DATE_PARTITION, 'parte': 0, 'documentos': missing})
+    if args.dias:
+        days = {day.strip() for day in args.dias.split(',')}
+        parts = [part for part in parts if part['dt'] in days]
+    if not parts:
+        print(f"Índice '{index}': no hay documentos para exportar.")
+        logging.warning(f"Índice '{index}': no hay documentos para exportar.")
+        return
+
+    # Cada día se exporta en una carpeta temporal (los lectores de Hive ignoran las que empiezan
+    # con "."), que reemplaza a la del día solo si se exportaron todas sus partes. Si falla una
+    # parte, el día queda como estaba antes de la ejecución
+    days = sorted({part['dt'] for part in parts})
+    tmp_dirs = {day: os.path.join(index, f".dt={day}.tmp") for day in days}
+    try:
+        for tmp_dir in tmp_dirs.values():
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            os.makedirs(tmp_dir)
+        logging.info(f"Índice '{index}': {len(parts)} partes en {len(days)} días.")
+
+        results = {day: [] for day in days}
+        failed_days = set()
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = {
+                executor.submit(profiler.wrap(export_partition), index, field, part, tmp_dirs[part['dt']], query, doc_bytes): part
+                for part in parts
+            }
+            for future, part in futures.items():
+                try:
+                    part_file, count = future.result()
+                    part['archivo'] = os.path.basename(part_file)
+                    part['documentos'] = count
+                    results[part['dt']].append(part)
+                except (requests.RequestException, IOError, sqlite3.Error, TransformError) as e:
+                    logging.error(f"Error al exportar la parte {part['parte']} del día {part['dt']} del índice '{index}': {e}")
+                    failed_days.add(part['dt'])
+                except Exception as e:
+                    # Un error inesperado (p. ej. una respuesta sin los campos esperados) solo invalida ese día
+                    logging.exception(f"Error inesperado al exportar la parte {part['parte']} del día {part['dt']} del índice '{index}': {e}")
+                    failed_days.add(part['dt'])
+
+        for day in days:
+            tmp_dir = tmp_dirs[day]
+            if day in failed_days:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                print(f"Error en el día {day} del índice '{index}'; el día no se modificó. Se puede reintentar con --dias {day}.")
+                continue
+            # Registrar en el día las partes exportadas y reemplazar la carpeta del día
+            day_parts = results[day]
+            manifest = {
+                'indice': index,
+                'dt': day,
+                'campo_fecha': field,
+                'fecha': datetime.now().isoformat(timespec='seconds'),
+                'query': query,
+                'documentos': sum(part['documentos'] for part in day_parts),
+                'partes': sorted(day_parts, key=lambda part: part['parte']),
+            }
+            with open(os.path.join(tmp_dir, '_manifest.json'), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, ensure_ascii=False, indent=4)
+            day_dir = os.path.join(index, f"dt={day}")
+            old_dir = os.path.join(index, f".dt={day}.old")
+            shutil.rmtree(old_dir, ignore_errors=True)
+            if os.path.exists(day_dir):
+                os.rename(day_dir, old_dir)
+            os.rename(tmp_dir, day_dir)
+            shutil.rmtree(old_dir, ignore_errors=True)
+    finally:
+        # Ninguna salida (ni un error al publicar ni Ctrl+C) deja carpetas temporales de días en el índice
+        for tmp_dir in tmp_dirs.values():
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    exported = len(days) - len(failed_days)
+    print(f"Datos del índice '{index}' guardados en '{index}/' ({exported} de {len(days)} días).")
+    logging.info(f"Datos del índice '{index}' guardados en '{index}/' ({exported} de {len(days)} días).")
+
+# Estado de --seguir para un índice: cursor (valores "sort" del último documento) y archivo abierto
+class FollowState:
+    def __init__(self, index, query):
+        self.index = index
+        self.query = query
+        self.base_dir = os.path.join('seguimiento', index)
+        self.cursor_file = os.path.join(self.base_dir, '_cursor.json')
+        self.cursor = None
+        self.cursor_ids = []  # Sin --desempate, _id de los documentos ya guardados con el valor del cursor
+        self.field_type = None
+        self.documents = 0
+        self.output = None
+        self.output_path = None
+        os.makedirs(self.base_dir, exist_ok=True)
+        if os.path.exists(self.cursor_file):
+            with open(self.cursor_file, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            # Un cursor de otro orden no sirve para continuar: se saltearían o repetirían documentos
+            if saved.get('orden') != sort_fields():
+                raise ValueError(f"El cursor '{self.cursor_file}' se guardó con el orden {saved.get('orden')} y se pidió "
+                                 f"{sort_fields()}. Use el mismo --campo-orden/--desempate o borre el cursor.")
+            self.cursor = saved['search_after']
+            self.cursor_ids = saved.get('ids_en_cursor', [])
+            self.documents = saved['documentos']
+
+    def save_cursor(self):
+        # Se escribe en un temporal y se renombra para no dejar un cursor a medias
+        tmp_file = f"{self.cursor_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'indice': self.index,
+                'orden': sort_fields(),
+                'search_after': self.cursor,
+                'ids_en_cursor': self.cursor_ids,
+                'documentos': self.documents,
+                'actualizado': datetime.now().isoformat(timespec='seconds'),
+            }, f, ensure_ascii=False, indent=4)
+        os.replace(tmp_file, self.cursor_file)
+
+    def output_file(self):
+        # Un archivo por hora (hora=AAAAMMDD-HH, en UTC como los días de --particionar); dentro de la hora se rota por tamaño
+        hour_dir = os.path.join(self.base_dir, f"hora={datetime.now(timezone.utc).strftime('%Y%m%d-%H')}")
+        if self.output and os.path.dirname(self.output_path) == hour_dir \
+                and self.output.tell() < args.rotar_mb * 1024 * 1024:
+            return self.output
+        self.close()
+        os.makedirs(hour_dir, exist_ok=True)
+        parts = sorted(name for name in os.listdir(hour_dir) if name.startswith('part-'))
+        number = int(parts[-1][5:9]) if parts else 0
+        path = os.path.join(hour_dir, f"part-{number:04d}.ndjson")
+        if os.path.exists(path) and os.path.getsize(path) >= args.rotar_mb * 1024 * 1024:
+            path = os.path.join(hour_dir, f"part-{number + 1:04d}.ndjson")
+        self.output = open(path, 'ab')
+        self.output_path = path
+        return self.output
+
+    def close(self):
+        if self.output:
+            self.output.close()
+            self.output = None
+
+# Campos de orden de --seguir
+def sort_fields():
+    fields = [args.campo_orden]
+    if args.desempate and args.desempate != args.campo_orden:
+        fields.append(args.desempate)
+    return fields
+
+# Posicionar el cursor en el último documento existente (--desde-ahora)
+def latest_cursor(state):
+    body = {
+        'size': 1,
+        'track_total_hits': False,
+        '_source': False,
+        'sort': [{field: 'desc'} for field in sort_fields()],
+    }
+    if state.query:
+        body['query'] = state.query
+    response = es.post(f"/{state.index}/_search", json=body, idempotent=True)
+    response.raise_for_status()
+    hits = response.json()['hits']['hits']
+    # Sin --desempate se vuelven a escribir los documentos con ese mismo valor (repetidos, no perdidos)
+    return hits[0]['sort'] if hits else None
+
+# Tipo del campo en el mapping del índice (None si todavía no tiene documentos con ese campo)
+def field_type(index, field):
+    response = es.get(f"/{index}/_field_caps?fields={quote(field)}")
+    response.raise_for_status()
+    return next(iter(response.json().get('fields', {}).get(field, {})), None)
+
+# Condición "campo >= valor del cursor". Los valores "sort" de las fechas son milisegundos
+# (date) o nanosegundos (date_nanos) desde 1970
+def range_from(value, field_type):
+    if field_type == 'date':
+        return {'gte': value, 'format': 'epoch_millis'}
+    if field_type == 'date_nanos':
+        seconds, nanos = divmod(value, 10 ** 9)
+        text = datetime.fromtimestamp(seconds, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S') + f".{nanos:09d}Z"
+        return {'gte': text, 'format': 'strict_date_optional_time_nanos'}
+    return {'gte': value}
+
+# Traer y agregar al archivo los documentos posteriores al cursor. Retorna cuántos se agregaron.
+# Con --desempate (campo único) se continúa con search_after. Sin él, varios documentos pueden
+# tener el mismo valor de --campo-orden: se pide desde ese valor inclusive, sin los _id ya guardados
+def follow_step(state):
+    if state.field_type is None:
+        state.field_type = field_type(state.index, args.campo_orden)
+    # Un documento sin --campo-orden quedaría último y su valor de orden (el máximo posible) como
+    # cursor, con lo que no se traería ningún documento más: se excluyen
+    filters = [{'exists': {'field': args.campo_orden}}]
+    if state.query:
+        filters.append(state.query)
+    if args.retraso_segundos and state.field_type in ('date', 'date_nanos'):
+        filters.append({'range': {args.campo_orden: {'lt': f"now-{args.retraso_segundos}s"}}})
+
+    added = 0
+    while True:
+        page_filters = list(filters)
+        must_not = []
+        body = {
+            'size': batch_size,
+            'track_total_hits': False,
+            'sort': [{field: 'asc'} for field in sort_fields()],
+        }
+        if state.cursor and args.desempate:
+            body['search_after'] = state.cursor
+        elif state.cursor:
+            page_filters.append({'range': {args.campo_orden: range_from(state.cursor[0], state.field_type)}})
+            if state.cursor_ids:
+                must_not.append({'ids': {'values': state.cursor_ids}})
+        body['query'] = {'bool': {'filter': page_filters, 'must_not': must_not}}
+        with profiler.phase('fetch'):
+            response = es.post(f"/{state.index}/_search", json=body, idempotent=True)
+        response.raise_for_status()
+        with profiler.phase('decode'):
+            hits = response.json()['hits']['hits']
+        if not hits:
+            return added
+
+        _, docs = next(export_pages([hits]))
+        with profiler.phase('serialize'):
+            data = b''.join(json.dumps(doc, ensure_ascii=False).encode('utf-8') + b'\n' for doc in docs if doc is not None)
+        with profiler.phase('write'):
+            f = state.output_file()
+            f.write(data)
+            f.flush()
+        # El cursor se guarda después de escribir: ante un corte se pueden repetir documentos, no perderlos
+        last = hits[-1]['sort']
+        if not args.desempate:
+            same = [hit['_id'] for hit in hits if hit['sort'] == last]
+            state.cursor_ids = (state.cursor_ids if last == state.cursor else []) + same
+        state.cursor = last
+        state.documents += len(hits)
+        state.save_cursor()
+        added += len(hits)
+        if len(hits) < batch_size:
+            return added
+
+# Seguir los índices hasta que se interrumpa con Ctrl+C, reutilizando la misma conexión.
+# "resolve" retorna de nuevo {índice concreto: consulta} de los nombres pedidos; se llama cada
+# --intervalo-segundos para seguir también los índices creados después de empezar (el nuevo
+# índice de escritura de un data stream o alias tras un rollover, o uno nuevo de un patrón)
+def follow_indices(queries_by_index, resolve=None):
+    states = {}  # {índice: FollowState}, o None si el índice no se puede seguir
+
+    def add_states(queries, from_now):
+        for index, query in queries.items():
+            if index in states:
+                continue
+            try:
+                state = FollowState(index, query)
+            except ValueError as e:
+                print(e)
+                logging.error(e)
+                states[index] = None
+                continue
+            # Un índice que aparece después de empezar se sigue desde el principio: todos sus documentos son nuevos
+            if state.cursor is None and from_now:
+                state.cursor = latest_cursor(state)
+            states[index] = state
+            logging.info(f"Siguiendo el índice '{index}' desde {state.cursor or 'el principio'}.")
+
+    add_states(queries_by_index, args.desde_ahora)
+    if not any(states.values()):
+        return
+
+    print("Siguiendo índices. Presione Ctrl+C para detener.")
+    resolved_at = time.monotonic()
+    try:
+        while any(states.values()):
+            if resolve and time.monotonic() - resolved_at >= args.intervalo_segundos:
+                new_queries = {index: query for index, query in resolve().items() if index not in states}
+                for index in new_queries:
+                    print(f"Índice nuevo '{index}': se empieza a seguir.")
+                add_states(new_queries, False)
+                resolved_at = time.monotonic()
+            added = 0
+            for state in [state for state in states.values() if state]:
+                try:
+                    count = follow_step(state)
+                except requests.RequestException as e:
+                    logging.error(f"Error al consultar documentos nuevos del índice '{state.index}': {e}")
+                    continue
+                except TransformError as e:
+                    # Reintentar fallaría siempre con el mismo documento: se deja de seguir el índice,
+                    # con el cursor antes de ese lote, para continuar al corregir la transformación
+                    print(f"Error al transformar documentos nuevos del índice '{state.index}': {e}. Se deja de seguir el índice.")
+                    logging.error(f"Error al transformar documentos nuevos del índice '{state.index}': {e}. Se deja de seguir el índice.")
+                    state.close()
+                    states[state.index] = None
+                    continue
+                if count:
+                    logging.info(f"Índice '{state.index}': {count} documentos nuevos ({state.documents} en total).")
+                added += count
+            if not added:
+                time.sleep(args.intervalo_segundos)
+    except KeyboardInterrupt:
+        print("\nSeguimiento detenido.")
+        logging.info("Seguimiento detenido por el usuario.")
+    finally:
+        for state in states.values():
+            if state:
+                state.close()
 
 # Ejecutar script
 if __name__ == "__main__":
@@ -115,21 +927,47 @@ if __name__ == "__main__":
             logging.error("No se encontraron índices en Elasticsearch.")
             sys.exit(1)
 
-        # Solicitar al usuario los índices a procesar
-        indices_to_process = input("Ingrese el nombre de los índices a procesar, separados por comas: ").split(',')
+        if job_filters:
+            # Los índices y sus filtros vienen del archivo de trabajo, leído al verificar las opciones
+            filters_by_index = job_filters
+            indices_to_process = list(filters_by_index)
+        else:
+            # Solicitar al usuario los índices a procesar
+            indices_to_process = input("Ingrese el nombre de los índices a procesar, separados por comas: ").split(',')
+            cli_filter = filter_from_args(args)
+            filters_by_index = {index.strip(): cli_filter for index in indices_to_process}
+
+        indices_to_process = [index.strip() for index in indices_to_process if index.strip()]  # Eliminar espacios en blanco
+
+        # Cada índice concreto se exporta una sola vez, con la unión de los filtros de los nombres
+        # que lo incluyen (y el filtro de los alias). Los nombres que no están en el listado (alias,
+        # data streams, patrones o índices creados después de guardar la caché) se resuelven con _resolve/index
+        queries_by_index = plan_concrete_indices(indices_to_process, es_indices, filters_by_index)
 
-        for index in indices_to_process:
-            index = index.strip()  # Eliminar espacios en blanco
-            if index in es_indices:
-                print(f"Índice '{index}' encontrado en Elasticsearch.")
-                logging.info(f"Índice '{index}' encontrado en Elasticsearch.")
-                fetch_data_from_elasticsearch(index)
-            else:
-                print(f"Índice '{index}' no encontrado en Elasticsearch.")
-                logging.warning(f"Índice '{index}' no encontrado en Elasticsearch.")
+        if args.seguir and queries_by_index:
+            follow_indices(queries_by_index,
+                           lambda: plan_concrete_indices(indices_to_process, es_indices, filters_by_index, report=False))
+        elif not args.seguir:
+            for index, query in queries_by_index.items():
+                if query:
+                    logging.info(f"Filtro aplicado al índice '{index}': {json.dumps(query, ensure_ascii=False)}")
+                if args.particionar:
+                    export_partitioned(index, args.particionar, query)
+                else:
+                    fetch_data_from_elasticsearch(index, query)
 
         print("Proceso completado.")
         logging.info("Proceso completado.")
+        if memory_budget.limit:
+            logging.info(f"Memoria reservada: pico de {memory_budget.peak / 1024 / 1024:.1f} MB "
+                         f"de {memory_budget.limit / 1024 / 1024:.1f} MB.")
     except Exception as e:
         logging.critical(f"Error crítico durante la ejecución del script: {e}")
         sys.exit(1)
+    finally:
+        if transform_pool:
+            transform_pool.close()
+        # Guardar el reporte de --profile, si se pidió
+        report_file = profiler.stop('etl1indice')
+        if report_file:
+            print(f"Reporte de perfilado guardado en '{report_file}'.")
@@ -0,0 +1,45 @@
+"""
+Este script busca documentos por _id en un índice exportado en NDJSON, usando el
+índice de offsets "<indice>.offsets.sqlite" que genera etl1indice.py con
+"--formato ndjson --indice-offsets".
+
+Cada búsqueda lee solo la línea del documento del archivo mapeado en memoria,
+sin recorrer ni cargar el archivo completo. No se conecta a ElasticSearch.
+
+Uso: python etlBuscar.py <indice>.offsets.sqlite <_id> [<_id> ...]
+
+"""
+
+import json
+import argparse
+import sqlite3
+import sys
+from offset_index import OffsetIndexReader
+
+# Opciones de línea de comandos
+parser = argparse.ArgumentParser(description="Busca documentos por _id en un índice exportado en NDJSON.")
+parser.add_argument('indice_offsets', help="Archivo <indice>.offsets.sqlite generado por etl1indice.py.")
+parser.add_argument('ids', nargs='+', metavar='_id', help="Identificadores de los documentos a buscar.")
+args = parser.parse_args()
+
+# Ejecutar script
+if __name__ == "__main__":
+    try:
+        reader = OffsetIndexReader(args.indice_offsets)
+    except sqlite3.Error as e:
+        print(f"No se pudo abrir el índice de offsets '{args.indice_offsets}': {e}")
+        sys.exit(1)
+
+    not_found = 0
+    try:
+        for doc_id in args.ids:
+            doc = reader.get(doc_id)
+            if doc is None:
+                not_found += 1
+                print(f"Documento '{doc_id}' no encontrado.", file=sys.stderr)
+                continue
+            print(json.dumps({'_id': doc_id, '_source': doc}, ensure_ascii=False))
+    finally:
+        reader.close()
+
+    sys.exit(1 if not_found else 0)
@@ -3,18 +3,161 @@ Este script extrae el contenido de los índices de ElasticSearch y los convierte
 los cuales son guardados en la carpeta "json".
 Se solicitan credenciales por consola.
 
-Completar en línea 32 "es_host" la dirección de la bbdd elastic junto con el puerto.
+Con "--destino chunks" cada índice se guarda como snapshot en un almacén de chunks
+direccionado por contenido (carpeta "snapshots"), de forma que las exportaciones
+repetidas solo escriben los chunks que cambiaron.
+
+Con "--solo-estadisticas" no se exportan documentos: se calcula en el servidor, mediante
+agregaciones, un perfil de los campos de cada índice (cardinalidad, mínimo/máximo,
+valores más frecuentes y tasa de nulos) que se guarda en "estadisticas/<indice>.json".
+
+Al exportar se registra en "verificacion/<indice>.json" la cantidad de documentos escritos y
+un checksum de _id + _source (independiente del orden). Con "--verificar" se compara ese
+registro con "_count" del cluster y, con "--verificar-hash", con el checksum recalculado
+recorriendo el índice por slices, sin volver a leer los archivos exportados.
+
+Con "--transformar modulo:funcion" cada documento pasa por esa función antes de guardarse,
+en un pool de procesos ("--procesos"), manteniendo el orden de los documentos.
+
+Con "--memoria-mb" los índices que se exportan en paralelo comparten un presupuesto de memoria:
+las páginas se achican en los índices con documentos anchos y un índice empieza solo cuando
+hay lugar para sus páginas en proceso.
+
+Con "--planificar" no se exportan documentos: se leen unas páginas de cada índice para medir
+documentos por segundo y bytes por documento, se mide cuánto rinde el cluster leyendo varios
+índices a la vez, se estima el tamaño y la duración de la exportación y la concurrencia
+conveniente, y se guarda un plan que se ejecuta con "--plan".
+
+Completar en la variable "es_hosts" la dirección de la bbdd elastic junto con el puerto.
 
 """
 
 
 import os  # Módulo estándar de Python para interactuar con el sistema operativo.
 import json  # Módulo estándar para manejar archivos y datos en formato JSON.
+import argparse  # Módulo estándar para leer las opciones de la línea de comandos.
+import itertools  # Módulo estándar con utilidades para recorrer iteradores.
+import shutil  # Módulo estándar de operaciones con archivos, usado para consultar el espacio libre.
+import time  # Módulo estándar para medir tiempos.
+from concurrent.futures import ThreadPoolExecutor, as_completed  # Ejecución de varios índices en paralelo.
+from datetime import datetime  # Clase estándar para obtener la fecha y hora actual.
 import requests  # Librería externa para realizar solicitudes HTTP.
 from requests.auth import HTTPBasicAuth  # Clase de la librería requests para manejar autenticación básica HTTP.
 import logging  # Módulo estándar para registrar mensajes de log.
 import sys  # Módulo estándar para interactuar con el sistema operativo, utilizado aquí para finalizar el script.
 import getpass  # Módulo estándar para solicitar contraseñas de manera segura (sin que se vean en pantalla).
+from es_client import NodePool, RateLimiter  # Cliente que reparte las solicitudes entre los nodos del cluster.
+from chunk_store import ChunkStore, SnapshotWriter  # Almacén de chunks para snapshots repetidos.
+from doc_checksum import DocChecksum  # Checksum de documentos independiente del orden.
+from profiling import PhaseProfiler  # Perfilado por fases para "--profile".
+from transform import TransformPool, TransformError, load_function  # Transformaciones en un pool de procesos.
+from index_cache import fetch_indices  # Listado de índices con solo las columnas necesarias.
+from memory_budget import MemoryBudget, measure_doc_bytes  # Presupuesto de memoria para "--memoria-mb".
+
+# Opciones de línea de comandos. Se leen antes de pedir credenciales para que "--help" no las solicite.
+parser = argparse.ArgumentParser(description="Exporta todos los índices de ElasticSearch.")
+parser.add_argument(
+    '--destino', choices=['json', 'chunks'],
+    help="'json' (por defecto) guarda json/<indice>.json; 'chunks' guarda un snapshot deduplicado en 'snapshots'."
+)
+parser.add_argument(
+    '--incluir-id', action='store_true',
+    help="Agrega el _id de cada documento como campo \"_id\" (para restaurarlo con etlRestaurar.py)."
+)
+parser.add_argument(
+    '--solo-estadisticas', action='store_true',
+    help="No exporta documentos; guarda un perfil de los campos de cada índice en 'estadisticas'."
+)
+parser.add_argument(
+    '--max-paginas-composite', type=int, default=100,
+    help="Páginas de agregación composite por campo para contar valores distintos exactos (0 = no paginar)."
+)
+parser.add_argument(
+    '--verificar', action='store_true',
+    help="No exporta; compara la cantidad de documentos registrada al exportar con '_count' del cluster."
+)
+parser.add_argument(
+    '--verificar-hash', action='store_true',
+    help="Con --verificar, recorre cada índice por slices y compara también el checksum de _id + _source."
+)
+parser.add_argument(
+    '--profile', action='store_true',
+    help="Mide tiempo y memoria por fase (connect, fetch, decode, transform, serialize, write) con cProfile y tracemalloc."
+)
+parser.add_argument(
+    '--concurrencia', type=int,
+    help="Cantidad de índices que se procesan en paralelo, por defecto 1 (las solicitudes se reparten entre los nodos)."
+)
+parser.add_argument(
+    '--max-solicitudes', type=float, metavar='N',
+    help="Máximo de solicitudes por segundo al cluster, entre todos los hilos (por defecto sin límite)."
+)
+parser.add_argument(
+    '--max-mb-segundo', type=float, metavar='MB',
+    help="Máximo de MB por segundo transferidos con el cluster, entre todos los hilos (por defecto sin límite)."
+)
+parser.add_argument(
+    '--reintentos', type=int, default=5,
+    help="Reintentos de las lecturas rechazadas por sobrecarga (429/5xx) o sin nodos disponibles."
+)
+parser.add_argument(
+    '--timeout-conexion', type=float, default=10, metavar='SEGUNDOS',
+    help="Segundos para conectar con un nodo antes de probar el siguiente."
+)
+parser.add_argument(
+    '--timeout-lectura', type=float, default=120, metavar='SEGUNDOS',
+    help="Segundos esperando la respuesta de un nodo antes de considerar fallida la solicitud."
+)
+parser.add_argument(
+    '--memoria-mb', type=float, metavar='MB',
+    help="Presupuesto de memoria para las páginas en proceso de todos los índices en paralelo (por defecto sin límite)."
+)
+parser.add_argument(
+    '--transformar', metavar='MODULO:FUNCION',
+    help="Aplica la función a cada documento antes de guardarlo, en un pool de procesos (None lo descarta)."
+)
+parser.add_argument(
+    '--procesos', type=int,
+    help="Procesos del pool de --transformar (por defecto, la cantidad de núcleos)."
+)
+parser.add_argument(
+    '--planificar', nargs='?', const='plan.json', metavar='ARCHIVO',
+    help="No exporta; muestrea cada índice, estima tamaño, duración y concurrencia y guarda un plan (por defecto plan.json)."
+)
+parser.add_argument(
+    '--plan', metavar='ARCHIVO',
+    help="Exporta según un plan generado con --planificar (índices, orden, destino y concurrencia)."
+)
+args = parser.parse_args()
+if args.verificar_hash and not args.verificar:
+    parser.error("--verificar-hash requiere --verificar.")
+if args.planificar and (args.plan or args.verificar or args.solo_estadisticas):
+    parser.error("--planificar no se puede combinar con --plan, --verificar ni --solo-estadisticas.")
+
+if args.plan and (args.destino or args.incluir_id or args.concurrencia or args.transformar):
+    # El plan se ejecuta tal cual: sus estimaciones dependen de estas opciones.
+    parser.error("--plan no se puede combinar con --destino, --incluir-id, --concurrencia ni --transformar; "
+                 "se usan las del plan.")
+
+# Con "--plan" se usan las opciones guardadas en el plan.
+export_plan = None
+if args.plan:
+    try:
+        with open(args.plan, 'r', encoding='utf-8') as f:
+            export_plan = json.load(f)
+    except (IOError, ValueError) as e:
+        parser.error(f"No se pudo leer el plan '{args.plan}': {e}")
+    args.destino = export_plan['destino']
+    args.incluir_id = export_plan['incluir_id']
+    args.concurrencia = export_plan['concurrencia']
+    args.transformar = export_plan.get('transformar')
+args.destino = args.destino or 'json'
+args.concurrencia = args.concurrencia or 1
+if args.transformar:
+    try:
+        load_function(args.transformar)
+    except (ImportError, ValueError) as e:
+        parser.error(f"No se pudo cargar la transformación '{args.transformar}': {e}")
 
 # Configurar logging para que los mensajes se guarden en un archivo y se muestren en formato específico.
 logging.basicConfig(
@@ -28,18 +171,35 @@ logging.basicConfig(
 input_user = input("Ingrese el usuario: ")
 input_password = getpass.getpass("Ingrese la contraseña: ")
 
+# Perfilado por fases ("--profile"). Empieza después de pedir las credenciales.
+profiler = PhaseProfiler(args.profile)
+profiler.start()
+
 # Configuración del host de ElasticSearch y tamaño de lote para las solicitudes.
-es_host = "http://TU_SERVIDOR:9200"
+es_hosts = ["http://TU_SERVIDOR:9200"]  # Uno o más nodos semilla del cluster.
+discover_nodes = False  # Si es True, se agregan los demás nodos HTTP informados por "_nodes/http".
+node_strategy = "round_robin"  # Reparto de solicitudes entre nodos: "round_robin" o "least_loaded".
 batch_size = 1000  # Tamaño de lote por defecto.
 
+# Configuración del perfil de campos ("--solo-estadisticas").
+precision_threshold = 40000  # Hasta este valor la agregación "cardinality" es prácticamente exacta.
+composite_page_size = 10000  # Buckets por página al contar valores distintos con "composite".
+composite_skip_margin = 1.2  # No se pagina composite si la estimación supera en este factor lo que cubren las páginas.
+fields_per_request = 50  # Campos que se agregan en cada solicitud.
+top_terms_size = 10  # Cantidad de valores más frecuentes por campo.
+
+# Configuración del plan de exportación ("--planificar").
+plan_sample_pages = 2  # Páginas de "batch_size" documentos que se leen de cada índice para medir.
+plan_max_concurrency = 8  # Concurrencia máxima que se evalúa (se mide con 1, 2, 4, ... índices a la vez).
+plan_concurrency_margin = 0.1  # Se deja de subir la concurrencia cuando el rendimiento mejora menos que este margen.
+if export_plan:
+    batch_size = export_plan.get('tamano_pagina', batch_size)
+
 # Función para validar las credenciales del usuario contra el servidor ElasticSearch.
-def validate_user_credentials(es_host, input_user, input_password):
+def validate_user_credentials(es):
     try:
         # Realiza una solicitud GET al host de ElasticSearch con las credenciales proporcionadas.
-        response = requests.get(
-            es_host,
-            auth=HTTPBasicAuth(input_user, input_password)
-        )
+        response = es.get('/')
         # Si la respuesta es 200 (OK), las credenciales son válidas.
         if response.status_code == 200:
             return True
@@ -51,70 +211,620 @@ def validate_user_credentials(es_host, input_user, input_password):
         return False
 
 # Validar las credenciales del usuario. Si son incorrectas, se termina la ejecución del script.
-if not validate_user_credentials(es_host, input_user, input_password):
+with profiler.phase('connect'):
+    # El límite de ritmo es uno solo para todos los hilos, así se puede fijar el que permite el cluster.
+    rate_limiter = RateLimiter(args.max_solicitudes, args.max_mb_segundo and args.max_mb_segundo * 1024 * 1024)
+    es = NodePool(es_hosts, auth=HTTPBasicAuth(input_user, input_password), strategy=node_strategy,
+                  pool_size=max(10, args.concurrencia), rate_limiter=rate_limiter, retries=args.reintentos,
+                  timeout=(args.timeout_conexion, args.timeout_lectura))
+    credentials_ok = validate_user_credentials(es)
+    if credentials_ok and discover_nodes:
+        es.discover_nodes()
+if not credentials_ok:
     print("Usuario o contraseña incorrectos.")
     sys.exit(1)
 
 # Crear directorios para guardar los archivos JSON, si no existen.
 os.makedirs('json', exist_ok=True)
 
+# Almacén de chunks e identificador del snapshot de esta ejecución (solo para "--destino chunks").
+chunk_store = ChunkStore('snapshots') if args.destino == 'chunks' else None
+snapshot_id = datetime.now().strftime('%Y%m%d-%H%M%S')
+
+# Presupuesto de memoria compartido por los índices en paralelo ("--memoria-mb").
+memory_budget = MemoryBudget(args.memoria_mb * 1024 * 1024 if args.memoria_mb else None)
+
+# Pool de procesos de "--transformar". Se crea antes de los hilos que procesan los índices.
+transform_pool = None
+if args.transformar and not (args.verificar or args.solo_estadisticas):
+    transform_pool = TransformPool(args.transformar, args.procesos)
+
 # Función para obtener la lista de índices de ElasticSearch.
 def get_indices_from_elasticsearch():
     try:
-        # Realiza una solicitud GET para obtener todos los índices en formato JSON.
-        response = requests.get(
-            f"{es_host}/_cat/indices?format=json",
-            auth=HTTPBasicAuth(input_user, input_password)
-        )
-        response.raise_for_status()  # Verifica si la solicitud fue exitosa.
+        # Pide a "_cat/indices" solo las columnas necesarias. No usa la caché de etlListado.py,
+        # para no omitir índices creados después de guardarla.
         # Retorna una lista de nombres de índices.
-        return [index['index'] for index in response.json()]
+        return [index['index'] for index in fetch_indices(es)]
     except requests.exceptions.RequestException as e:
         # Captura y registra cualquier error durante la obtención de los índices.
         logging.error(f"Error al obtener los índices de ElasticSearch: {e}")
         return []
 
+# Función que mide el ancho de los documentos de un índice, elige el tamaño de página y reserva la
+# memoria de sus páginas en proceso en el presupuesto de "--memoria-mb", esperando si está ocupado.
+# Retorna (documentos por página, reserva a liberar al terminar el índice).
+def admit_index(index, workers, depth=2):
+    doc_bytes = measure_doc_bytes(es, index) if memory_budget.limit else 0
+    page_size, reservation = memory_budget.admit(doc_bytes, batch_size, depth, workers)
+    if page_size < batch_size:
+        logging.info(f"Índice '{index}': documentos de {doc_bytes:.0f} bytes en promedio, páginas de {page_size} documentos.")
+    return page_size, reservation
+
+# Función que recorre todos los documentos de un índice, página por página, usando scroll.
+# Con "body" (por ejemplo un slice) la primera solicitud se envía con ese cuerpo. Con
+# "reservation" se registra el tamaño real de cada página en el presupuesto de memoria.
+def iter_pages_from_elasticsearch(index, body=None, page_size=None, reservation=None):
+    scroll_id = None
+    try:
+        url = f"/{index}/_search?scroll=1m&size={page_size or batch_size}"
+        while True:
+            with profiler.phase('fetch'):
+                if body and not scroll_id:
+                    response = es.post(url, json=body, idempotent=True)
+                else:
+                    # Avanzar el scroll no es idempotente: tras un timeout no se reintenta, porque
+                    # la página pudo haberse consumido en el servidor.
+                    response = es.get(url, retry_on_timeout=not scroll_id)
+            response.raise_for_status()  # Verifica si la solicitud fue exitosa.
+            if reservation:
+                reservation.observe_page(len(response.content))
+            with profiler.phase('decode'):
+                result = response.json()
+            scroll_id = result.get('_scroll_id')
+            hits = result['hits']['hits']  # Extrae los datos reales del JSON.
+            if not hits:
+                break
+            yield hits
+            url = f"/_search/scroll?scroll=1m&scroll_id={scroll_id}"
+    finally:
+        # Liberar el contexto de scroll en el servidor.
+        if scroll_id:
+            try:
+                es.delete('/_search/scroll', json={'scroll_id': scroll_id})
+            except requests.exceptions.RequestException:
+                pass
+
 # Función para extraer datos de un índice específico en ElasticSearch.
 def fetch_data_from_elasticsearch(index):
+    reservation = None
     try:
-        # Realiza una solicitud GET para obtener los datos del índice especificado.
-        response = requests.get(
-            f"{es_host}/{index}/_search?size={batch_size}",
-            auth=HTTPBasicAuth(input_user, input_password)
-        )
-        response.raise_for_status()  # Verifica si la solicitud fue exitosa.
-        data = response.json()['hits']['hits']  # Extrae los datos reales del JSON.
+        # Páginas en proceso: la que se lee, la que se escribe y las de la cola del pool de transformaciones.
+        depth = 2 + (transform_pool.max_pending if transform_pool else 0)
+        # Se borra el registro de la exportación anterior: si esta falla, "--verificar" no debe
+        # aprobar un archivo incompleto comparándolo con el registro viejo.
+        delete_verification(index)
+        page_size, reservation = admit_index(index, args.concurrencia, depth)
+        pages = iter_pages_from_elasticsearch(index, page_size=page_size, reservation=reservation)
+        first_page = next(pages, None)
 
-        if not data:
+        if not first_page:
             reason = f"Índice '{index}' vacío."
             return None, reason  # Retorna si el índice está vacío.
 
-        # Guardar los datos en un archivo JSON.
-        save_json(index, data)
+        # Guardar los datos a medida que llegan las páginas, calculando el checksum al escribir.
+        pages = itertools.chain([first_page], pages)
+        checksum = DocChecksum()
+        if args.destino == 'chunks':
+            saved = save_snapshot(index, pages, checksum)
+        else:
+            saved = save_json(index, pages, checksum)
+        if not saved:
+            return None, f"Error al guardar los datos del índice '{index}'."
+        output_file, written = saved
+        save_verification(index, checksum, output_file, written)
         return True, None
 
     except requests.exceptions.RequestException as e:
         # Captura y registra cualquier error durante la extracción de datos.
         reason = f"Error al obtener datos del índice '{index}': {e}"
         return None, reason
+    except TransformError as e:
+        # Un error de la función de "--transformar" hace fallar solo este índice.
+        reason = f"Error al transformar los documentos del índice '{index}': {e}"
+        return None, reason
+    finally:
+        if reservation:
+            reservation.release()
+
+# Función que arma el documento tal como se guarda: el _source y, con "--incluir-id", su _id.
+def export_doc(doc):
+    if args.incluir_id:
+        return {'_id': doc['_id'], **doc['_source']}
+    return doc['_source']
+
+# Función que arma los documentos de cada página tal como se guardan, calculando el checksum de
+# lo leído (no de lo guardado). Con "--transformar" las páginas pasan por el pool de procesos, en orden, mientras se
+# siguen leyendo las siguientes; los documentos descartados por la transformación se omiten.
+def export_pages(pages, checksum):
+    def batches():
+        for page in pages:
+            with profiler.phase('checksum'):
+                for doc in page:
+                    checksum.add(doc['_id'], doc['_source'])
+            with profiler.phase('transform'):
+                docs = [export_doc(doc) for doc in page]
+            yield docs
+
+    if not transform_pool:
+        yield from batches()
+        return
+    for docs in transform_pool.map(batches(), profiler.phase('transform')):
+        docs = [doc for doc in docs if doc is not None]
+        if docs:
+            yield docs
 
 # Función para guardar los datos extraídos en un archivo JSON.
-def save_json(index, data):
+# Se escribe página por página, con el mismo formato que json.dump(..., indent=4), en un temporal
+# que reemplaza al archivo al terminar: si falla la lectura o la transformación a mitad del índice,
+# queda el archivo de la exportación anterior.
+# Retorna (archivo, documentos guardados), o None si no se pudo escribir.
+def save_json(index, pages, checksum):
+    json_file = f"json/{index}.json"  # Define el nombre del archivo JSON.
+    tmp_file = f"{json_file}.tmp"
     try:
-        json_file = f"json/{index}.json"  # Define el nombre del archivo JSON.
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump([doc['_source'] for doc in data], f, ensure_ascii=False, indent=4)
+        written = 0
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write('[')
+            empty = True
+            for docs in export_pages(pages, checksum):
+                written += len(docs)
+                with profiler.phase('serialize'):
+                    text = ',\n    '.join(
+                        json.dumps(doc, ensure_ascii=False, indent=4).replace('\n', '\n    ') for doc in docs
+                    )
+                with profiler.phase('write'):
+                    f.write(('\n    ' if empty else ',\n    ') + text)
+                empty = False
+            f.write(']' if empty else '\n]')
+        os.replace(tmp_file, json_file)
         # Registro de que el archivo se guardó correctamente.
         logging.info(f"Datos del índice '{index}' guardados en '{json_file}'.")
+        return json_file, written
+    except requests.exceptions.RequestException:
+        # Es un IOError, pero de la lectura: lo informa fetch_data_from_elasticsearch().
+        raise
     except IOError as e:
         # Captura y registra cualquier error durante la escritura del archivo.
         logging.error(f"Error al guardar los datos del índice '{index}' en JSON: {e}")
+    finally:
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+# Función para guardar los datos extraídos como snapshot en el almacén de chunks.
+# Retorna (manifiesto, documentos guardados), o None si no se pudo escribir.
+def save_snapshot(index, pages, checksum):
+    try:
+        writer = SnapshotWriter(chunk_store, snapshot_id, index)
+        for docs in export_pages(pages, checksum):
+            with profiler.phase('serialize'):
+                lines = [json.dumps(doc, ensure_ascii=False).encode('utf-8') + b'\n' for doc in docs]
+            # El SnapshotWriter agrupa las líneas y escribe los chunks a medida que se completan.
+            with profiler.phase('write'):
+                for line in lines:
+                    writer.add_line(line)
+        manifest_file = writer.close()
+        logging.info(
+            f"Snapshot del índice '{index}' guardado en '{manifest_file}' "
+            f"({writer.new_chunks} de {len(writer.chunks)} chunks nuevos, {writer.new_bytes} bytes escritos)."
+        )
+        return manifest_file, writer.doc_count
+    except requests.exceptions.RequestException:
+        raise  # Error de lectura, no de escritura: lo informa fetch_data_from_elasticsearch().
+    except IOError as e:
+        logging.error(f"Error al guardar el snapshot del índice '{index}': {e}")
+
+# Función para guardar la cantidad de documentos y el checksum calculados al escribir un índice.
+# "documentos" y "checksum" son de los documentos leídos del cluster (lo que "--verificar" compara);
+# "documentos_escritos" es lo que quedó en el archivo, menos si "--transformar" descartó documentos.
+def save_verification(index, checksum, output_file, written):
+    try:
+        os.makedirs('verificacion', exist_ok=True)
+        with open(f"verificacion/{index}.json", 'w', encoding='utf-8') as f:
+            json.dump({
+                'indice': index,
+                'fecha': datetime.now().isoformat(timespec='seconds'),
+                'archivo': output_file,
+                'documentos': checksum.count,
+                'documentos_escritos': written,
+                'checksum': checksum.hexdigest(),
+            }, f, ensure_ascii=False, indent=4)
+    except IOError as e:
+        logging.error(f"Error al guardar la verificación del índice '{index}': {e}")
+
+# Función que borra el registro de verificación de un índice antes de volver a exportarlo.
+def delete_verification(index):
+    try:
+        os.remove(f"verificacion/{index}.json")
+    except FileNotFoundError:
+        pass
+
+# Función que recorre de nuevo un índice en paralelo (scroll por slices) y calcula su checksum.
+def rescan_checksum(index, slices):
+    def scan_slice(slice_id):
+        checksum = DocChecksum()
+        body = {'slice': {'id': slice_id, 'max': slices}} if slices > 1 else None
+        page_size, reservation = admit_index(index, args.concurrencia * slices)
+        try:
+            for page in iter_pages_from_elasticsearch(index, body, page_size, reservation):
+                for doc in page:
+                    checksum.add(doc['_id'], doc['_source'])
+        finally:
+            reservation.release()
+        return checksum
+
+    with ThreadPoolExecutor(max_workers=slices) as executor:
+        partials = list(executor.map(scan_slice, range(slices)))
+    total = DocChecksum()
+    for partial in partials:
+        total.merge(partial)
+    return total
+
+# Función que compara lo registrado al exportar un índice con lo que hay en el cluster:
+# la cantidad de documentos ("_count") y, con "--verificar-hash", el checksum recalculado.
+def verify_index(index):
+    try:
+        response = es.get(f"/{index}/_count")
+        response.raise_for_status()
+        cluster_count = response.json()['count']
+
+        verification_file = f"verificacion/{index}.json"
+        if not os.path.exists(verification_file):
+            if cluster_count == 0:
+                return True, None  # Los índices vacíos no generan archivo.
+            return None, f"Índice '{index}' sin exportación registrada en '{verification_file}'."
+        with open(verification_file, 'r', encoding='utf-8') as f:
+            expected = json.load(f)
+
+        if expected['documentos'] != cluster_count:
+            return None, (f"Índice '{index}': {expected['documentos']} documentos exportados, "
+                          f"{cluster_count} en ElasticSearch.")
+
+        if args.verificar_hash:
+            checksum = rescan_checksum(index, max(1, args.concurrencia))
+            if checksum.hexdigest() != expected['checksum']:
+                return None, f"Índice '{index}': el checksum exportado no coincide con el del cluster."
+
+        logging.info(f"Índice '{index}' verificado: {cluster_count} documentos.")
+        return True, None
+
+    except (requests.exceptions.RequestException, IOError, ValueError) as e:
+        reason = f"Error al verificar el índice '{index}': {e}"
+        return None, reason
+
+# Tipos de campo que admiten agregaciones, agrupados según las métricas que se calculan.
+RANGE_FIELD_TYPES = {'long', 'integer', 'short', 'byte', 'double', 'float', 'half_float',
+                     'scaled_float', 'unsigned_long', 'date', 'date_nanos'}
+TERMS_FIELD_TYPES = {'keyword', 'constant_keyword', 'boolean', 'ip'}
+
+# Función que recorre el mapping de un índice y retorna {campo: (tipo, campo_agregable)}.
+# Los campos "text" se agregan a través de su subcampo keyword, si lo tienen.
+def get_index_fields(index):
+    response = es.get(
+        f"/{index}/_mapping"
+    )
+    response.raise_for_status()
+
+    fields = {}
+    def walk(properties, prefix):
+        for name, mapping in properties.items():
+            path = f"{prefix}{name}"
+            field_type = mapping.get('type', 'object')
+            if field_type == 'nested':
+                continue  # Requiere agregaciones "nested"; no se perfila.
+            if 'properties' in mapping:
+                walk(mapping['properties'], f"{path}.")
+                continue
+            aggregatable = None
+            if field_type in RANGE_FIELD_TYPES or field_type in TERMS_FIELD_TYPES:
+                aggregatable = path
+            else:
+                for sub_name, sub_mapping in mapping.get('fields', {}).items():
+                    if sub_mapping.get('type') == 'keyword':
+                        aggregatable = f"{path}.{sub_name}"
+                        break
+            fields[path] = (field_type, aggregatable)
+
+    for index_mapping in response.json().values():
+        walk(index_mapping.get('mappings', {}).get('properties', {}), '')
+    return fields
+
+# Función que cuenta los valores distintos exactos de un campo paginando una agregación composite.
+# Retorna None si el campo tiene más valores que los que entran en max_pages páginas.
+def count_distinct_composite(index, field, max_pages):
+    distinct = 0
+    after_key = None
+    for _ in range(max_pages):
+        composite = {'size': composite_page_size, 'sources': [{'valor': {'terms': {'field': field}}}]}
+        if after_key:
+            composite['after'] = after_key
+        response = es.post(
+            f"/{index}/_search",
+            json={'size': 0, 'aggs': {'distintos': {'composite': composite}}},
+            idempotent=True
+        )
+        response.raise_for_status()
+        result = response.json()['aggregations']['distintos']
+        distinct += len(result['buckets'])
+        after_key = result.get('after_key')
+        if not after_key or len(result['buckets']) < composite_page_size:
+            return distinct
+    return None
+
+# Función que calcula el perfil de los campos de un índice usando solo agregaciones.
+def profile_index(index):
+    try:
+        fields = get_index_fields(index)
+        aggregatable = [(name, field_type, agg_field) for name, (field_type, agg_field) in fields.items() if agg_field]
+        profile = {
+            'indice': index,
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'documentos': 0,
+            'campos': {name: {'tipo': field_type, 'agregable': False}
+                       for name, (field_type, agg_field) in fields.items() if not agg_field},
+        }
+
+        # Se agregan varios campos por solicitud, cada uno con un prefijo "fN_".
+        for start in range(0, max(len(aggregatable), 1), fields_per_request):
+            batch = aggregatable[start:start + fields_per_request]
+            aggs = {}
+            for i, (name, field_type, agg_field) in enumerate(batch):
+                aggs[f"f{i}_cardinalidad"] = {'cardinality': {'field': agg_field, 'precision_threshold': precision_threshold}}
+                aggs[f"f{i}_nulos"] = {'missing': {'field': agg_field}}
+                if field_type in RANGE_FIELD_TYPES:
+                    aggs[f"f{i}_rango"] = {'stats': {'field': agg_field}}
+                else:
+                    aggs[f"f{i}_top"] = {'terms': {'field': agg_field, 'size': top_terms_size}}
+
+            response = es.post(
+                f"/{index}/_search",
+                json={'size': 0, 'track_total_hits': True, 'aggs': aggs},
+                idempotent=True
+            )
+            response.raise_for_status()
+            result = response.json()
+            total = result['hits']['total']['value']
+            profile['documentos'] = total
+            results = result.get('aggregations', {})
+
+            for i, (name, field_type, agg_field) in enumerate(batch):
+                nulls = results[f"f{i}_nulos"]['doc_count']
+                field_profile = {
+                    'tipo': field_type,
+                    'agregable': True,
+                    'campo_agregado': agg_field,
+                    # La agregación cardinality es aproximada (HyperLogLog), también por debajo de precision_threshold.
+                    'cardinalidad': results[f"f{i}_cardinalidad"]['value'],
+                    'cardinalidad_exacta': False,
+                    'nulos': nulls,
+                    'tasa_nulos': round(nulls / total, 6) if total else None,
+                }
+                if field_type in RANGE_FIELD_TYPES:
+                    stats = results[f"f{i}_rango"]
+                    field_profile['min'] = stats.get('min_as_string', stats.get('min'))
+                    field_profile['max'] = stats.get('max_as_string', stats.get('max'))
+                else:
+                    top = results[f"f{i}_top"]
+                    field_profile['top'] = [
+                        {'valor': bucket.get('key_as_string', bucket['key']), 'documentos': bucket['doc_count']}
+                        for bucket in top['buckets']
+                    ]
+                    # Si no quedaron documentos fuera de los buckets, los buckets son todos los valores distintos.
+                    if top.get('sum_other_doc_count') == 0:
+                        field_profile['cardinalidad'] = len(top['buckets'])
+                        field_profile['cardinalidad_exacta'] = True
+                profile['campos'][name] = field_profile
+
+        # Los demás campos se cuentan de forma exacta paginando composite (los de pocos valores, en una página).
+        # Si la estimación ya supera con margen lo que cubren "--max-paginas-composite" páginas, el conteo
+        # no terminaría: se deja la estimación sin recorrer el índice.
+        if args.max_paginas_composite > 0:
+            composite_limit = args.max_paginas_composite * composite_page_size * composite_skip_margin
+            for name, field_profile in profile['campos'].items():
+                if field_profile['agregable'] and not field_profile['cardinalidad_exacta'] \
+                        and field_profile['cardinalidad'] <= composite_limit:
+                    distinct = count_distinct_composite(index, field_profile['campo_agregado'], args.max_paginas_composite)
+                    if distinct is not None:
+                        field_profile['cardinalidad'] = distinct
+                        field_profile['cardinalidad_exacta'] = True
+
+        save_profile(index, profile)
+        return True, None
+
+    except requests.exceptions.RequestException as e:
+        reason = f"Error al calcular el perfil del índice '{index}': {e}"
+        return None, reason
+
+# Función para guardar el perfil de un índice en "estadisticas/<indice>.json".
+def save_profile(index, profile):
+    try:
+        os.makedirs('estadisticas', exist_ok=True)
+        profile_file = f"estadisticas/{index}.json"
+        with open(profile_file, 'w', encoding='utf-8') as f:
+            json.dump(profile, f, ensure_ascii=False, indent=4)
+        logging.info(f"Perfil del índice '{index}' guardado en '{profile_file}'.")
+    except IOError as e:
+        logging.error(f"Error al guardar el perfil del índice '{index}': {e}")
+
+# Función para obtener la cantidad de documentos y el tamaño en disco de cada índice.
+def get_indices_sizes():
+    try:
+        response = es.get(
+            "/_cat/indices?format=json&bytes=b&h=index,health,docs.count,store.size,pri.store.size"
+        )
+        response.raise_for_status()
+        return {row['index']: row for row in response.json()}
+    except requests.exceptions.RequestException as e:
+        logging.warning(f"No se pudo obtener el tamaño de los índices: {e}")
+        return {}
+
+# Función que calcula cuántos bytes ocupa un documento en el archivo de salida, según el destino.
+def output_size(doc):
+    if args.destino == 'chunks':
+        return len(json.dumps(doc, ensure_ascii=False).encode('utf-8')) + 1  # Una línea NDJSON.
+    # En el JSON cada documento va con sangría y separado del anterior por ",\n    ".
+    return len(json.dumps(doc, ensure_ascii=False, indent=4).replace('\n', '\n    ').encode('utf-8')) + 6
+
+# Función que lee las primeras páginas de un índice como en la exportación (scroll, checksum,
+# "--transformar" y serialización) y retorna (documentos leídos, bytes que ocuparían, segundos).
+def sample_index(index):
+    output_bytes = 0
+    checksum = DocChecksum()
+    start = time.perf_counter()
+    pages = iter_pages_from_elasticsearch(index)
+    try:
+        for docs in export_pages(itertools.islice(pages, plan_sample_pages), checksum):
+            output_bytes += sum(output_size(doc) for doc in docs)
+    finally:
+        pages.close()  # Libera el contexto de scroll.
+    return checksum.count, output_bytes, time.perf_counter() - start
+
+# Entradas del plan de cada índice ("--planificar"), completadas por plan_index().
+plan_entries = {}
+indices_sizes = {}
+
+# Función que muestrea un índice y estima el tamaño de su exportación y cuánto tardará.
+# Si el muestreo falla, el índice queda en el plan sin estimaciones (null), para que "--plan" lo exporte igual.
+def plan_index(index):
+    entry = {
+        'indice': index,
+        'documentos': None,
+        'bytes_almacenados': int(indices_sizes.get(index, {}).get('pri.store.size') or 0),
+        'muestra_documentos': 0,
+        'muestra_segundos': 0.0,
+        'documentos_por_segundo': None,
+        'bytes_por_documento': None,
+        'bytes_estimados': None,
+        'segundos_estimados': None,
+    }
+    plan_entries[index] = entry
+    try:
+        response = es.get(f"/{index}/_count")
+        response.raise_for_status()
+        count = response.json()['count']
+        entry.update({'documentos': count, 'bytes_estimados': 0, 'segundos_estimados': 0.0})
+        if count:
+            docs, output_bytes, elapsed = sample_index(index)
+            if docs:
+                rate = docs / elapsed if elapsed > 0 else float(docs)
+                entry.update({
+                    'muestra_documentos': docs,
+                    'muestra_segundos': round(elapsed, 3),
+                    'documentos_por_segundo': round(rate, 1),
+                    'bytes_por_documento': round(output_bytes / docs, 1),
+                    'bytes_estimados': round(count * output_bytes / docs),
+                    'segundos_estimados': round(count / rate, 1),
+                })
+        return True, None
+
+    except (requests.exceptions.RequestException, TransformError) as e:
+        reason = f"Error al muestrear el índice '{index}': {e}"
+        entry.update({'bytes_estimados': None, 'segundos_estimados': None, 'error': reason})
+        return None, reason
+
+# Función que mide el rendimiento conjunto (documentos por segundo) muestreando a la vez 1, 2, 4, ...
+# de los índices dados, hasta plan_max_concurrency. Se detiene cuando duplicar la concurrencia mejora
+# el rendimiento menos que plan_concurrency_margin, o si falla un muestreo. Retorna {concurrencia: docs/s}.
+def measure_concurrency(indices):
+    throughput = {}
+    workers = 1
+    while workers <= min(plan_max_concurrency, len(indices)):
+        start = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                docs = sum(result[0] for result in executor.map(sample_index, indices[:workers]))
+        except (requests.exceptions.RequestException, TransformError) as e:
+            logging.warning(f"Se detuvo la medición de concurrencia con {workers} índices a la vez: {e}")
+            break
+        elapsed = time.perf_counter() - start
+        throughput[workers] = docs / elapsed if elapsed > 0 else float(docs)
+        logging.info(f"Concurrencia {workers}: {throughput[workers]:.1f} documentos por segundo.")
+        if workers > 1 and throughput[workers] < throughput[workers // 2] * (1 + plan_concurrency_margin):
+            break
+        workers *= 2
+    return throughput
+
+# Función que estima la duración total con "workers" índices en paralelo, con cada índice
+# "slowdown" veces más lento que medido solo. Los índices se asignan de mayor a menor duración
+# al primer hilo libre, como hace el ThreadPoolExecutor con el orden del plan.
+def estimate_duration(durations, workers, slowdown=1.0):
+    loads = [0.0] * workers
+    for duration in sorted(durations, reverse=True):
+        loads[loads.index(min(loads))] += duration * slowdown
+    return max(loads)
+
+# Función que arma el plan con las entradas de todos los índices y lo guarda en "plan_file".
+# La concurrencia es la última que mejoró el rendimiento conjunto medido; las duraciones con
+# cada concurrencia medida se corrigen por cuánto se frena cada índice al compartir el cluster.
+# Los índices sin estimación van primero (pueden ser los más largos) y no cuentan en los bytes ni en la duración.
+def save_plan(plan_file):
+    entries = sorted(plan_entries.values(), key=lambda entry: (entry['segundos_estimados'] is not None,
+                                                               -(entry['segundos_estimados'] or 0)))
+    durations = [entry['segundos_estimados'] for entry in entries if entry['documentos'] and entry['segundos_estimados'] is not None]
+    # Se mide con los índices más grandes, cuyas muestras tienen las páginas completas.
+    sampled = sorted((entry for entry in entries if entry['muestra_documentos']), key=lambda entry: -entry['documentos'])
+    throughput = measure_concurrency([entry['indice'] for entry in sampled])
+    if not throughput:
+        throughput = {1: None}
+    by_concurrency = {
+        workers: estimate_duration(durations, workers, workers * throughput[1] / rate if workers > 1 and rate else 1.0)
+        for workers, rate in throughput.items()
+    }
+    # La última concurrencia medida solo se usa si mejoró el rendimiento respecto de la anterior.
+    concurrency = 1
+    for workers in sorted(throughput)[1:]:
+        if throughput[workers] >= throughput[workers // 2] * (1 + plan_concurrency_margin):
+            concurrency = workers
+
+    total_bytes = sum(entry['bytes_estimados'] or 0 for entry in entries)
+    plan = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'destino': args.destino,
+        'incluir_id': args.incluir_id,
+        'transformar': args.transformar,
+        'tamano_pagina': batch_size,
+        'concurrencia': concurrency,
+        'estimacion': {
+            'documentos': sum(entry['documentos'] or 0 for entry in entries),
+            'bytes': total_bytes,
+            'indices_sin_estimacion': [entry['indice'] for entry in entries if entry['segundos_estimados'] is None],
+            'segundos': round(by_concurrency[concurrency], 1),
+            'segundos_por_concurrencia': {str(workers): round(seconds, 1) for workers, seconds in by_concurrency.items()},
+            'documentos_por_segundo_por_concurrencia': {str(workers): rate and round(rate, 1) for workers, rate in throughput.items()},
+            'espacio_libre_bytes': shutil.disk_usage('.').free,
+        },
+        'indices': entries,
+    }
+    with open(plan_file, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, ensure_ascii=False, indent=4)
+    logging.info(f"Plan guardado en '{plan_file}': {json.dumps(plan['estimacion'], ensure_ascii=False)}")
+    return plan
 
 # Función para mostrar una animación simple de carga en la consola (puntos consecutivos).
 def print_loading_animation():
     sys.stdout.write('.')
     sys.stdout.flush()
 
+# Función que procesa un índice según el modo elegido (exportar, verificar o solo estadísticas).
+def process_index(index):
+    if args.planificar:
+        return plan_index(index)
+    if args.verificar:
+        return verify_index(index)
+    if args.solo_estadisticas:
+        return profile_index(index)
+    return fetch_data_from_elasticsearch(index)
+
 # Punto de entrada del script. Ejecuta el proceso ETL.
 if __name__ == "__main__":
     try:
@@ -126,21 +836,32 @@ if __name__ == "__main__":
             logging.error("No se encontraron índices en ElasticSearch.")
             exit(1)
 
+        # Con "--plan" se exportan los índices del plan, en su orden (de mayor a menor duración estimada).
+        if export_plan:
+            es_indices = [entry['indice'] for entry in export_plan['indices']]
+            logging.info(f"Ejecutando el plan '{args.plan}': {json.dumps(export_plan['estimacion'], ensure_ascii=False)}")
+        if args.planificar:
+            indices_sizes = get_indices_sizes()
+
         success_count = 0  # Contador de operaciones exitosas.
         fail_count = 0  # Contador de operaciones fallidas.
         failed_indices = []  # Lista para almacenar índices que fallaron.
 
-        # Iterar sobre cada índice para extraer y guardar sus datos.
-        for index in es_indices:
-            result, reason = fetch_data_from_elasticsearch(index)
-            if result:
-                success_count += 1
-            else:
-                fail_count += 1
-                failed_indices.append((index, reason))
+        # Procesar los índices, hasta "--concurrencia" a la vez, para extraer y guardar sus datos.
+        # Al planificar se muestrea de a un índice, para que las mediciones no compitan entre sí.
+        with ThreadPoolExecutor(max_workers=1 if args.planificar else args.concurrencia) as executor:
+            futures = {executor.submit(profiler.wrap(process_index), index): index for index in es_indices}
+            for future in as_completed(futures):
+                index = futures[future]
+                result, reason = future.result()
+                if result:
+                    success_count += 1
+                else:
+                    fail_count += 1
+                    failed_indices.append((index, reason))
 
-            # Mostrar animación con puntos consecutivos.
-            print_loading_animation()
+                # Mostrar animación con puntos consecutivos.
+                print_loading_animation()
 
         # Mostrar resultados finales en la consola.
         sys.stdout.write(f"\nProceso completado: {success_count} éxitos, {fail_count} fallos.\n")
@@ -150,10 +871,36 @@ if __name__ == "__main__":
 
         # Registrar los resultados finales en el archivo de log.
         logging.info(f"Proceso completado: {success_count} éxitos, {fail_count} fallos.")
+        if memory_budget.limit:
+            logging.info(f"Memoria reservada: pico de {memory_budget.peak / 1024 / 1024:.1f} MB "
+                         f"de {memory_budget.limit / 1024 / 1024:.1f} MB.")
         for index, reason in failed_indices:
             logging.error(f"Fallo en índice '{index}': {reason}")
 
+        # Guardar el plan y mostrar la estimación, si se pidió "--planificar".
+        if args.planificar:
+            plan = save_plan(args.planificar)
+            estimate = plan['estimacion']
+            sys.stdout.write(
+                f"Plan guardado en '{args.planificar}': {estimate['documentos']} documentos, "
+                f"{estimate['bytes'] / 1024 / 1024:.1f} MB, {estimate['segundos'] / 60:.1f} minutos "
+                f"con concurrencia {plan['concurrencia']}.\n"
+            )
+            if estimate['indices_sin_estimacion']:
+                sys.stdout.write(f"{len(estimate['indices_sin_estimacion'])} índices no se pudieron muestrear: quedan en el "
+                                 f"plan sin estimación y no cuentan en los bytes ni en los minutos.\n")
+            if estimate['bytes'] > estimate['espacio_libre_bytes']:
+                sys.stdout.write("Advertencia: el espacio libre en disco no alcanza para la exportación estimada.\n")
+                logging.warning("El espacio libre en disco no alcanza para la exportación estimada.")
+
     except Exception as e:
         # Captura y registra cualquier error crítico que ocurra durante la ejecución.
         logging.critical(f"Error crítico durante la ejecución del ETL: {e}")
         exit(1)
+    finally:
+        if transform_pool:
+            transform_pool.close()
+        # Guardar el reporte de "--profile", si se pidió.
+        report_file = profiler.stop('etlElastic')
+        if report_file:
+            sys.stdout.write(f"Reporte de perfilado guardado en '{report_file}'.\n")
@@ -3,15 +3,37 @@ Este script muestra una lista con los nombres de los indices disponibles en el s
 Solicita credenciales por consola.
 Se guarda un archivo log con los resultados.
 
-Completar en línea 28 "es_host" la dirección de la bbdd elastic junto con el puerto.
+Se puede filtrar por patrón de nombres ("--patron logs-*") y por salud ("--salud red"),
+en el servidor, y ordenar por tamaño o cantidad de documentos ("--orden tamano --limite 20").
+El listado se guarda en la carpeta "cache" y se reutiliza durante "--ttl" segundos, también
+desde los exportadores.
+
+Completar en la variable "es_hosts" la dirección de la bbdd elastic junto con el puerto.
 
 """
 
+import argparse
 import requests
 from requests.auth import HTTPBasicAuth
 import logging
 import getpass
 import sys
+from es_client import NodePool
+from index_cache import list_indices, sort_indices, SORT_KEYS
+
+# Opciones de línea de comandos. Se leen antes de pedir credenciales para que "--help" no las solicite.
+parser = argparse.ArgumentParser(description="Lista los índices de ElasticSearch.")
+parser.add_argument('--patron', default='*',
+                    help="Patrón de nombres, p. ej. 'logs-*' o 'logs-*,-logs-old*' (se filtra en el servidor).")
+parser.add_argument('--salud', choices=['green', 'yellow', 'red'], help="Solo índices con esta salud (se filtra en el servidor).")
+parser.add_argument('--orden', choices=list(SORT_KEYS), default='nombre',
+                    help="Orden del listado: nombre, o tamaño/documentos de mayor a menor.")
+parser.add_argument('--limite', type=int, help="Muestra solo los primeros N índices del orden elegido.")
+parser.add_argument('--detalle', action='store_true', help="Muestra también salud, estado, documentos y tamaño.")
+parser.add_argument('--ttl', type=int, default=300,
+                    help="Segundos que se reutiliza el listado guardado en 'cache' (0 = consultar siempre).")
+parser.add_argument('--refrescar', action='store_true', help="Consulta el cluster aunque la caché esté vigente.")
+args = parser.parse_args()
 
 # Configurar logging con formato UTF-8
 logging.basicConfig(
@@ -25,16 +47,15 @@ input_user = input("Ingrese el usuario: ")
 input_password = getpass.getpass("Ingrese la contraseña: ")  # Ocultar la entrada de la contraseña
 
 # Configuración para ElasticSearch
-es_host = "http://TU_SERVIDOR:9200"
+es_hosts = ["http://TU_SERVIDOR:9200"]  # Uno o más nodos semilla del cluster.
+discover_nodes = False  # Si es True, se agregan los demás nodos HTTP informados por "_nodes/http".
+node_strategy = "round_robin"  # Reparto de solicitudes entre nodos: "round_robin" o "least_loaded".
 
 # Verificar si el usuario y la contraseña ingresados son válidos contra el host de ElasticSearch
-def validate_user_credentials(es_host, input_user, input_password):
+def validate_user_credentials(es):
     try:
         # Realiza una solicitud GET al endpoint raíz de Elasticsearch
-        response = requests.get(
-            es_host,
-            auth=HTTPBasicAuth(input_user, input_password)
-        )
+        response = es.get('/')
         # Si la respuesta es 200 OK, las credenciales son válidas
         if response.status_code == 200:
             return True
@@ -45,39 +66,53 @@ def validate_user_credentials(es_host, input_user, input_password):
         return False
 
 # Validar las credenciales del usuario
-if not validate_user_credentials(es_host, input_user, input_password):
+es = NodePool(es_hosts, auth=HTTPBasicAuth(input_user, input_password), strategy=node_strategy, retries=5)
+if not validate_user_credentials(es):
     print("Usuario o contraseña incorrectos.")
     sys.exit(1)
+if discover_nodes:
+    es.discover_nodes()
 
-# Obtener lista de índices de ElasticSearch
-def get_indices_from_elasticsearch(es_host, input_user, input_password):
+# Obtener lista de índices de ElasticSearch (o de la caché, si está vigente)
+def get_indices_from_elasticsearch(es):
     try:
-        response = requests.get(
-            f"{es_host}/_cat/indices?format=json",
-            auth=HTTPBasicAuth(input_user, input_password)
-        )
-        response.raise_for_status()
-        indices = response.json()
-        return [index['index'] for index in indices]
+        rows, cache_age = list_indices(es, args.patron, args.salud, ttl=args.ttl, refresh=args.refrescar)
+        if cache_age is not None:
+            print(f"Listado tomado de la caché (de hace {cache_age:.0f} segundos; --refrescar para actualizarlo).")
+        return rows
     except requests.RequestException as e:
         logging.error(f"Error al obtener la lista de índices de Elasticsearch: {e}")
         return []
 
+# Tamaño en bytes en formato legible
+def format_size(size):
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if size < 1024 or unit == 'TB':
+            return f"{size:.0f}{unit}" if unit == 'B' else f"{size:.1f}{unit}"
+        size /= 1024
+
 # Ejecutar script
 if __name__ == "__main__":
     try:
-        # Obtener y ordenar los índices alfabéticamente
-        index_names = sorted(get_indices_from_elasticsearch(es_host, input_user, input_password))
-
-        if index_names:
-            print("\nListado de nombres de los índices (ordenado alfabéticamente):")
-            for name in index_names:
-                print(name)
-                logging.info(f"Índice encontrado: {name}")
-
-            # Mostrar la cantidad total de índices
-            print(f"\nCantidad total de índices: {len(index_names)}")
-            logging.info(f"Cantidad total de índices: {len(index_names)}")
+        # Obtener y ordenar los índices (alfabéticamente, por defecto)
+        indices = sort_indices(get_indices_from_elasticsearch(es), args.orden)
+        shown = indices[:args.limite] if args.limite else indices
+
+        if indices:
+            print(f"\nListado de nombres de los índices (ordenado por {args.orden}):")
+            for row in shown:
+                if args.detalle:
+                    print(f"{row['index']:<50} {row.get('health') or '-':<7} {row.get('status') or '-':<6} "
+                          f"{row['docs.count']:>14} {format_size(row['store.size']):>10}")
+                else:
+                    print(row['index'])
+
+            # Mostrar la cantidad total de índices. En el log va solo el resumen: con decenas
+            # de miles de índices, una línea por índice lo vuelve inmanejable.
+            print(f"\nCantidad total de índices: {len(indices)}")
+            if len(shown) < len(indices):
+                print(f"(se muestran los primeros {len(shown)})")
+            logging.info(f"Cantidad total de índices: {len(indices)} (patrón '{args.patron}', salud {args.salud or 'cualquiera'}).")
         else:
             print("No se encontraron índices en Elasticsearch.")
             logging.warning("No se encontraron índices en Elasticsearch.")
@@ -0,0 +1,345 @@
+"""
+Este script restaura en ElasticSearch los archivos generados por los exportadores,
+enviándolos con la API "_bulk".
+Lee arreglos JSON (etlElastic.py / etl1indice.py), NDJSON (--formato ndjson),
+archivos comprimidos con gzip (.gz), carpetas con varias partes y manifiestos de
+snapshots del almacén de chunks (etlElastic.py --destino chunks).
+Se solicitan credenciales por consola.
+
+Los documentos se agrupan en lotes por tamaño en bytes y se envían con varios
+workers en paralelo. Si ElasticSearch rechaza algunos documentos por sobrecarga
+(429), se reintentan solo esos, con espera exponencial.
+Si los archivos se exportaron con "--incluir-id", "--conservar-id" mantiene los _id.
+
+Uso: python etlRestaurar.py [--indice destino] ARCHIVO_O_CARPETA [...]
+
+Completar en la variable "es_hosts" la dirección de la bbdd elastic junto con el puerto
+(o indicarla con --hosts, por ejemplo para probar contra un servidor local).
+
+"""
+
+import os
+import json
+import gzip
+import time
+import random
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.auth import HTTPBasicAuth
+import logging
+import sys
+import getpass
+from es_client import NodePool, RateLimiter, NoAliveNodesError
+from chunk_store import ChunkStore
+
+# Opciones de línea de comandos. Se leen antes de pedir credenciales para que "--help" no las solicite.
+parser = argparse.ArgumentParser(description="Restaura en ElasticSearch los archivos exportados, usando _bulk.")
+parser.add_argument('rutas', nargs='+', metavar='ARCHIVO',
+                    help="Archivos .json/.ndjson (opcionalmente .gz), carpetas o manifiestos de snapshot.")
+parser.add_argument('--indice', help="Índice destino. Por defecto, el nombre de cada archivo o el del manifiesto.")
+parser.add_argument('--conservar-id', action='store_true',
+                    help="Usa el campo \"_id\" de cada documento (exportado con --incluir-id) como _id.")
+parser.add_argument('--workers', type=int, default=4, help="Solicitudes _bulk en paralelo.")
+parser.add_argument('--lote-mb', type=float, default=5, help="Tamaño máximo de cada solicitud _bulk, en MB.")
+parser.add_argument('--reintentos', type=int, default=5, help="Reintentos de los documentos rechazados por sobrecarga.")
+parser.add_argument('--max-solicitudes', type=float, metavar='N',
+                    help="Máximo de solicitudes por segundo al cluster, entre todos los workers (por defecto sin límite).")
+parser.add_argument('--max-mb-segundo', type=float, metavar='MB',
+                    help="Máximo de MB por segundo enviados y recibidos, entre todos los workers (por defecto sin límite).")
+parser.add_argument('--timeout-conexion', type=float, default=10, metavar='SEGUNDOS',
+                    help="Segundos para conectar con un nodo antes de probar el siguiente.")
+parser.add_argument('--timeout-lectura', type=float, default=120, metavar='SEGUNDOS',
+                    help="Segundos esperando la respuesta de un nodo (un _bulk grande puede tardar).")
+parser.add_argument('--hosts', help="Nodos de ElasticSearch separados por coma (reemplaza a es_hosts).")
+args = parser.parse_args()
+
+# Configurar logging con formato UTF-8
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[logging.FileHandler("etlRestaurar_process.log", encoding='utf-8')]
+)
+
+# Solicitar al usuario ingresar usuario y contraseña
+input_user = input("Ingrese el usuario: ")
+input_password = getpass.getpass("Ingrese la contraseña: ")  # Ocultar la entrada de la contraseña
+
+# Configuración para ElasticSearch
+es_hosts = ["http://TU_SERVIDOR:9200"]  # Uno o más nodos semilla del cluster.
+discover_nodes = False  # Si es True, se agregan los demás nodos HTTP informados por "_nodes/http".
+node_strategy = "round_robin"  # Reparto de solicitudes entre nodos: "round_robin" o "least_loaded".
+if args.hosts:
+    es_hosts = [host.strip() for host in args.hosts.split(',') if host.strip()]
+
+# Códigos con los que ElasticSearch indica que el documento se puede reenviar más tarde.
+RETRYABLE_STATUS = {429, 503}
+
+# Verificar si el usuario y la contraseña ingresados son válidos contra el host de ElasticSearch
+def validate_user_credentials(es):
+    try:
+        response = es.get('/')
+        return response.status_code == 200
+    except requests.exceptions.RequestException as e:
+        logging.error(f"Error al conectar con ElasticSearch: {e}")
+        return False
+
+# Validar las credenciales del usuario
+rate_limiter = RateLimiter(args.max_solicitudes, args.max_mb_segundo and args.max_mb_segundo * 1024 * 1024)
+es = NodePool(es_hosts, auth=HTTPBasicAuth(input_user, input_password), strategy=node_strategy,
+              pool_size=max(10, args.workers), rate_limiter=rate_limiter, retries=args.reintentos,
+              timeout=(args.timeout_conexion, args.timeout_lectura))
+if not validate_user_credentials(es):
+    print("Usuario o contraseña incorrectos.")
+    sys.exit(1)
+if discover_nodes:
+    es.discover_nodes()
+
+# Abrir un archivo exportado, descomprimiéndolo si termina en .gz
+def open_export(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, 'r', encoding='utf-8')
+
+# Recorrer un arreglo JSON documento por documento, sin cargar todo el archivo en memoria
+def iter_json_array(f, read_size=1024 * 1024):
+    decoder = json.JSONDecoder()
+    buffer = f.read(read_size).lstrip()
+    if not buffer.startswith('['):
+        raise ValueError("El archivo no contiene un arreglo JSON.")
+    position = 1
+    eof = False
+    while True:
+        # Saltar espacios y la coma entre documentos.
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            doc, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            # El documento quedó cortado: se descarta lo ya leído y se lee otro bloque.
+            more = f.read(read_size)
+            eof = not more
+            buffer = buffer[position:] + more
+            position = 0
+            continue
+        yield doc
+
+# Recorrer los documentos de un archivo NDJSON
+def iter_ndjson_lines(lines):
+    for line in lines:
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+# Recorrer los documentos de un manifiesto de snapshot del almacén de chunks
+def iter_snapshot(manifest_path, manifest):
+    # El manifiesto está en <base>/manifests/<snapshot>/<indice>.json
+    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(manifest_path))))
+    store = ChunkStore(base_dir)
+    for data in store.iter_snapshot_bytes(manifest):
+        yield from iter_ndjson_lines(data.split(b'\n'))
+
+# Listar los archivos a restaurar con el índice destino por defecto de cada uno.
+# En una carpeta, cada archivo suelto va al índice con su nombre (p. ej. "json/"), y los
+# archivos dentro de subcarpetas de partición ("<indice>/dt=.../part-0000.ndjson") van al
+# índice de la carpeta que las contiene.
+def list_sources(paths):
+    sources = []
+    for path in paths:
+        if not os.path.isdir(path):
+            sources.append((path, index_from_file_name(path)))
+            continue
+        files = []
+        for root, dirs, names in os.walk(path):
+            # Se saltean las carpetas temporales de exportaciones interrumpidas, no las ocultas: los
+            # índices de data streams y los índices ocultos también empiezan con "." (".ds-logs-...")
+            dirs[:] = [name for name in dirs if not is_temporary_dir(name)]
+            files.extend(os.path.join(root, name) for name in names if is_data_file(name))
+        for file in sorted(files):
+            parts = os.path.relpath(file, path).split(os.sep)
+            if len(parts) == 1:
+                index = index_from_file_name(file)
+            elif '=' not in parts[0]:
+                index = parts[0]
+            else:
+                index = os.path.basename(os.path.normpath(path))
+            sources.append((file, index))
+    return sources
+
+def index_from_file_name(path):
+    name = os.path.basename(path)
+    for suffix in ('.gz', '.ndjson', '.json'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    return name
+
+# Carpetas temporales de los exportadores: ".dt=AAAA-MM-DD.tmp" y ".dt=AAAA-MM-DD.old" de --particionar,
+# y cualquier "*.tmp".
+def is_temporary_dir(name):
+    return name.endswith('.tmp') or (name.startswith('.dt=') and name.endswith('.old'))
+
+def is_data_file(name):
+    # Los "*.tmp" de una exportación en curso no terminan en una extensión de datos.
+    if name.endswith('.manifest.json') or name.startswith('_'):
+        return False
+    return name.endswith(('.json', '.ndjson', '.json.gz', '.ndjson.gz'))
+
+# Abrir un archivo exportado según su formato.
+# Retorna (índice indicado en el archivo o None, iterador de documentos).
+def read_source(path):
+    with open_export(path) as f:
+        start = f.read(1)
+        while start and start.isspace():
+            start = f.read(1)
+        if start == '{' and path.endswith('.json'):
+            # Un .json que no es un arreglo es un manifiesto de snapshot.
+            f.seek(0)
+            manifest = json.load(f)
+            if 'chunks' not in manifest:
+                raise ValueError(f"'{path}' no es un arreglo JSON ni un manifiesto de snapshot.")
+            return manifest.get('indice'), iter_snapshot(path, manifest)
+    return None, iter_file_documents(path, start == '[')
+
+def iter_file_documents(path, is_array):
+    with open_export(path) as f:
+        if is_array:
+            yield from iter_json_array(f)
+        else:
+            yield from iter_ndjson_lines(f)
+
+# Convertir un documento en las dos líneas de la API _bulk
+def bulk_item(index, doc):
+    doc = dict(doc)
+    doc_id = doc.pop('_id', None)  # "_id" no puede ir dentro del documento.
+    action = {'_index': index}
+    if args.conservar_id and doc_id is not None:
+        action['_id'] = doc_id
+    return (json.dumps({'index': action}, ensure_ascii=False) + '\n'
+            + json.dumps(doc, ensure_ascii=False) + '\n').encode('utf-8')
+
+# Si la línea de acción de un elemento _bulk lleva _id (reenviarlo no duplica el documento)
+def has_id(item):
+    action = json.loads(item.split(b'\n', 1)[0])
+    return '_id' in next(iter(action.values()))
+
+# Contadores compartidos entre los workers
+stats_lock = threading.Lock()
+stats = {'enviados': 0, 'fallidos': 0, 'reintentados': 0}
+
+def add_stats(**counts):
+    with stats_lock:
+        for key, value in counts.items():
+            stats[key] += value
+
+# Enviar un lote a _bulk, reintentando solo los documentos rechazados por sobrecarga
+def send_bulk(items):
+    for attempt in range(args.reintentos + 1):
+        # Un timeout se reintenta solo si todos los documentos del lote tienen _id: sin _id,
+        # ElasticSearch pudo haber indexado el lote y reenviarlo crearía duplicados. Con
+        # --conservar-id puede haber documentos sin _id (archivos exportados sin --incluir-id).
+        with_ids = args.conservar_id and all(has_id(item) for item in items)
+        try:
+            response = es.post(
+                '/_bulk',
+                data=b''.join(items),
+                headers={'Content-Type': 'application/x-ndjson'},
+                retry_on_timeout=with_ids
+            )
+        except NoAliveNodesError:
+            # Ningún nodo aceptó la conexión: el lote no llegó al cluster y se puede reenviar
+            if attempt == args.reintentos:
+                raise
+            retry = items
+        except (requests.exceptions.Timeout, requests.exceptions.ConnectionError):
+            # Timeout de lectura o conexión cortada: el lote pudo haberse indexado
+            if not with_ids or attempt == args.reintentos:
+                raise
+            retry = items
+        else:
+            if response.status_code in RETRYABLE_STATUS:
+                retry = items
+            else:
+                response.raise_for_status()
+                result = response.json()
+                retry = []
+                failed = 0
+                for item, outcome in zip(items, result['items']):
+                    status = next(iter(outcome.values()))
+                    if status.get('status', 500) in RETRYABLE_STATUS:
+                        retry.append(item)
+                    elif status.get('error'):
+                        failed += 1
+                        logging.error(f"Documento rechazado: {status['error']}")
+                add_stats(enviados=len(items) - len(retry) - failed, fallidos=failed)
+
+        if not retry:
+            return
+        if attempt < args.reintentos:
+            add_stats(reintentados=len(retry))
+            # Espera exponencial con variación aleatoria para no reintentar todos a la vez.
+            time.sleep(random.uniform(0, min(30, 0.5 * 2 ** attempt)))
+            items = retry
+    add_stats(fallidos=len(retry))
+    logging.error(f"{len(retry)} documentos siguen rechazados después de {args.reintentos} reintentos.")
+
+# Leer los documentos y enviarlos en lotes por tamaño, con varios workers en paralelo
+def restore(sources):
+    max_bytes = int(args.lote_mb * 1024 * 1024)
+    # Limita los lotes leídos y no enviados, para no cargar todo en memoria.
+    in_flight = threading.BoundedSemaphore(args.workers * 2)
+    errors = []
+
+    def done(future):
+        in_flight.release()
+        if future.exception():
+            errors.append(future.exception())
+
+    def submit(executor, batch):
+        if errors:
+            raise errors[0]
+        in_flight.acquire()
+        executor.submit(send_bulk, batch).add_done_callback(done)
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        for path, default_index in sources:
+            index_hint, docs = read_source(path)
+            index = args.indice or index_hint or default_index
+            logging.info(f"Restaurando '{path}' en el índice '{index}'.")
+            batch, batch_size = [], 0
+            for doc in docs:
+                item = bulk_item(index, doc)
+                if batch and batch_size + len(item) > max_bytes:
+                    submit(executor, batch)
+                    batch, batch_size = [], 0
+                batch.append(item)
+                batch_size += len(item)
+            if batch:
+                submit(executor, batch)
+    if errors:
+        raise errors[0]
+
+# Ejecutar script
+if __name__ == "__main__":
+    try:
+        sources = list_sources(args.rutas)
+        if not sources:
+            print("No se encontraron archivos para restaurar.")
+            logging.error("No se encontraron archivos para restaurar.")
+            sys.exit(1)
+
+        restore(sources)
+
+        print(f"Proceso completado: {stats['enviados']} documentos restaurados, {stats['fallidos']} fallidos, "
+              f"{stats['reintentados']} reintentos.")
+        logging.info(f"Proceso completado: {stats['enviados']} documentos restaurados, {stats['fallidos']} fallidos, "
+                     f"{stats['reintentados']} reintentos.")
+        if stats['fallidos']:
+            sys.exit(1)
+    except Exception as e:
+        logging.critical(f"Error crítico durante la ejecución del script: {e}")
+        sys.exit(1)
@@ -0,0 +1,87 @@
+"""
+Listado de índices con caché local.
+
+Pide a "_cat/indices" solo las columnas necesarias ("h="), con el patrón de nombres y
+el estado de salud filtrados en el servidor, y guarda el resultado en la carpeta
+"cache" durante "ttl" segundos. Así, en clusters con decenas de miles de índices, el
+listado se descarga una vez y lo reutilizan etlListado.py y los exportadores.
+
+La caché se identifica por el primer host, el usuario, el patrón y la salud: cada
+combinación tiene su archivo.
+"""
+
+import os
+import json
+import time
+import hashlib
+from urllib.parse import quote
+
+# Columnas que se piden a "_cat/indices".
+CAT_COLUMNS = ('index', 'health', 'status', 'docs.count', 'store.size')
+
+# Orden de los índices: nombre, tamaño en disco o cantidad de documentos (de mayor a menor).
+SORT_KEYS = {
+    'nombre': (lambda row: row['index'], False),
+    'tamano': (lambda row: row['store.size'], True),
+    'documentos': (lambda row: row['docs.count'], True),
+}
+
+
+def fetch_indices(es, pattern='*', health=None):
+    """Consulta "_cat/indices" y retorna una fila (dict) por índice, con tamaño y documentos como enteros."""
+    path = f"/_cat/indices/{quote(pattern, safe=',*-')}?format=json&bytes=b&h={','.join(CAT_COLUMNS)}"
+    if health:
+        path += f"&health={health}"
+    response = es.get(path)
+    if response.status_code == 404:
+        return []  # El patrón nombra un índice que no existe.
+    response.raise_for_status()
+    rows = response.json()
+    for row in rows:
+        # Los índices cerrados no informan documentos ni tamaño.
+        row['docs.count'] = int(row.get('docs.count') or 0)
+        row['store.size'] = int(row.get('store.size') or 0)
+    return rows
+
+
+def cache_file(es, pattern='*', health=None, cache_dir='cache'):
+    user = getattr(es.session.auth, 'username', '')
+    key = json.dumps([es.hosts[0], user, pattern, health or ''])
+    return os.path.join(cache_dir, f"indices-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.json")
+
+
+def list_indices(es, pattern='*', health=None, ttl=300, refresh=False, cache_dir='cache'):
+    """
+    Retorna (filas de los índices, antigüedad de la caché en segundos o None si se consultó
+    el cluster). Con ttl=0 no se usa la caché; con refresh=True se consulta y se actualiza.
+    """
+    path = cache_file(es, pattern, health, cache_dir)
+    if ttl and not refresh and os.path.exists(path):
+        age = time.time() - os.path.getmtime(path)
+        if age < ttl:
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    return json.load(f)['indices'], age
+            except (IOError, ValueError, KeyError):
+                pass  # Caché dañada: se vuelve a consultar.
+
+    rows = fetch_indices(es, pattern, health)
+    if ttl:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Se escribe en un temporal y se renombra, por si otro script la lee al mismo tiempo.
+        tmp_file = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'patron': pattern, 'salud': health, 'indices': rows}, f, ensure_ascii=False)
+        os.replace(tmp_file, path)
+    return rows, None
+
+
+def sort_indices(rows, order='nombre'):
+    key, reverse = SORT_KEYS[order]
+    return sorted(rows, key=key, reverse=reverse)
+
+
+def index_names(es, ttl=300, refresh=False):
+    """Conjunto con los nombres de todos los índices, para comprobar existencia en O(1)."""
+    rows, _ = list_indices(es, ttl=ttl, refresh=refresh)
+    return {row['index'] for row in rows}
@@ -0,0 +1,115 @@
+"""
+Presupuesto de memoria para exportaciones concurrentes ("--memoria-mb").
+
+La memoria de una exportación depende del tamaño de página x el ancho de los documentos
+x la cantidad de trabajos en paralelo. Antes de empezar cada trabajo (un índice o una
+parte) se mide el tamaño promedio de sus documentos con una consulta chica, se elige un
+tamaño de página para que sus páginas en proceso (respuesta HTTP, documentos decodificados,
+cola del pool de transformaciones y texto a escribir) entren en su parte del presupuesto, y
+se reserva esa memoria. Si el presupuesto está ocupado, el trabajo espera a que termine otro.
+
+Las reservas se toman solo al empezar un trabajo, sin tener otras reservas, así que dos
+trabajos nunca quedan esperándose entre sí. Si una página real resulta más grande que lo
+estimado la reserva crece sin esperar (la página ya está en memoria), y los trabajos
+siguientes esperan más.
+"""
+
+import threading
+
+# Relación aproximada entre los bytes JSON de una página y la memoria que ocupa mientras se
+# procesa: la respuesta HTTP, los dicts de Python decodificados y el texto serializado.
+MEMORY_FACTOR = 6
+
+# Tamaño mínimo de página, aunque los documentos sean muy anchos.
+MIN_PAGE_SIZE = 10
+
+
+def measure_doc_bytes(es, index, query=None, sample_size=100):
+    """Bytes JSON promedio por documento (con sus metadatos), según una búsqueda de sample_size documentos."""
+    body = {'size': sample_size}
+    if query:
+        body['query'] = query
+    response = es.post(f"/{index}/_search", json=body, idempotent=True)
+    response.raise_for_status()
+    hits = len(response.json()['hits']['hits'])
+    return len(response.content) / hits if hits else 0
+
+
+class Reservation:
+    """Memoria reservada por un trabajo; se libera con release() al terminarlo."""
+
+    def __init__(self, budget, depth=1):
+        self.budget = budget
+        self.depth = depth
+        self.size = 0
+
+    def acquire(self, size):
+        self.size = self.budget.acquire(size)
+
+    def observe_page(self, page_bytes):
+        """Agranda la reserva si "depth" páginas como esta ocupan más que lo reservado."""
+        needed = int(page_bytes * MEMORY_FACTOR * self.depth)
+        if self.budget.limit and needed > self.size:
+            self.budget.grow(needed - self.size)
+            self.size = needed
+
+    def release(self):
+        self.budget.release(self.size)
+        self.size = 0
+
+
+class MemoryBudget:
+    """Bytes reservados por los trabajos en curso, compartidos por todos los hilos. limit=None = sin límite."""
+
+    def __init__(self, limit=None):
+        self.limit = limit
+        self.in_use = 0
+        self.peak = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, size):
+        """
+        Espera hasta que haya lugar para "size" bytes y los reserva. Si no hay nada reservado
+        se admite aunque supere el límite, para que un trabajo más grande que el presupuesto
+        se ejecute solo en lugar de esperar para siempre.
+        """
+        if not self.limit:
+            return 0
+        size = int(size)
+        with self.condition:
+            while self.in_use and self.in_use + size > self.limit:
+                self.condition.wait()
+            self.in_use += size
+            self.peak = max(self.peak, self.in_use)
+        return size
+
+    def grow(self, size):
+        with self.condition:
+            self.in_use += size
+            self.peak = max(self.peak, self.in_use)
+
+    def release(self, size):
+        if not size:
+            return
+        with self.condition:
+            self.in_use -= size
+            self.condition.notify_all()
+
+    def page_size(self, doc_bytes, max_page_size, depth=2, workers=1):
+        """Documentos por página para que "depth" páginas entren en la parte del presupuesto de cada uno de "workers" trabajos."""
+        if not self.limit or not doc_bytes:
+            return max_page_size
+        share = self.limit / max(1, workers)
+        page_size = int(share / (depth * doc_bytes * MEMORY_FACTOR))
+        return max(MIN_PAGE_SIZE, min(max_page_size, page_size))
+
+    def admit(self, doc_bytes, max_page_size, depth=2, workers=1):
+        """
+        Elige el tamaño de página para documentos de "doc_bytes" bytes y reserva la memoria de
+        "depth" páginas (esperando si hace falta). Retorna (documentos por página, Reservation).
+        """
+        reservation = Reservation(self, depth)
+        page_size = self.page_size(doc_bytes, max_page_size, depth, workers)
+        if self.limit and doc_bytes:
+            reservation.acquire(page_size * doc_bytes * MEMORY_FACTOR * depth)
+        return page_size, reservation
@@ -0,0 +1,97 @@
+"""
+Índice de offsets para acceso directo a documentos exportados en NDJSON.
+
+Junto a cada archivo NDJSON se puede guardar una tabla SQLite con, para cada
+"_id", el archivo que lo contiene, la posición (offset en bytes) de su línea y
+su largo. La tabla está ordenada por "_id" (clave primaria sin rowid), así que
+una búsqueda cuesta O(log n) y el documento se lee directamente del archivo
+mapeado en memoria, sin recorrerlo ni cargarlo completo.
+"""
+
+import os
+import json
+import mmap
+import sqlite3
+
+# Cantidad de filas que se acumulan antes de insertarlas en la tabla.
+INSERT_BATCH_SIZE = 10000
+
+
+class OffsetIndexWriter:
+    """Registra la ubicación de cada documento a medida que se escribe el NDJSON."""
+
+    def __init__(self, path):
+        self.path = path
+        # Las rutas de los archivos de datos se guardan relativas a la carpeta del índice.
+        self.base_dir = os.path.dirname(os.path.abspath(path))
+        if os.path.exists(path):
+            os.remove(path)
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE offsets ("
+            " id TEXT PRIMARY KEY,"
+            " archivo TEXT NOT NULL,"
+            " offset INTEGER NOT NULL,"
+            " largo INTEGER NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self.pending = []
+        self.count = 0
+        self.relative_paths = {}
+
+    def add(self, doc_id, data_file, offset, length):
+        # La ruta relativa se calcula una vez por archivo de datos, no por documento.
+        relative = self.relative_paths.get(data_file)
+        if relative is None:
+            relative = self.relative_paths[data_file] = os.path.relpath(os.path.abspath(data_file), self.base_dir)
+        self.pending.append((doc_id, relative, offset, length))
+        self.count += 1
+        if len(self.pending) >= INSERT_BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            # Si un "_id" se repite (p. ej. dos índices con el mismo id) queda el último.
+            self.connection.executemany("INSERT OR REPLACE INTO offsets VALUES (?, ?, ?, ?)", self.pending)
+            self.pending = []
+
+    def close(self):
+        self.flush()
+        self.connection.commit()
+        self.connection.close()
+
+
+class OffsetIndexReader:
+    """Busca documentos por "_id" usando el índice de offsets y los archivos mapeados en memoria."""
+
+    def __init__(self, path):
+        self.base_dir = os.path.dirname(os.path.abspath(path))
+        self.connection = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        self.files = {}
+
+    def mapped_file(self, data_file):
+        if data_file not in self.files:
+            f = open(os.path.join(self.base_dir, data_file), 'rb')
+            self.files[data_file] = (f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        return self.files[data_file][1]
+
+    def get_raw(self, doc_id):
+        """Retorna la línea NDJSON (bytes) del documento, o None si no está en el índice."""
+        row = self.connection.execute(
+            "SELECT archivo, offset, largo FROM offsets WHERE id = ?", (doc_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        data_file, offset, length = row
+        return self.mapped_file(data_file)[offset:offset + length]
+
+    def get(self, doc_id):
+        raw = self.get_raw(doc_id)
+        return None if raw is None else json.loads(raw)
+
+    def close(self):
+        for f, mapped in self.files.values():
+            mapped.close()
+            f.close()
+        self.files = {}
+        self.connection.close()
@@ -0,0 +1,164 @@
+"""
+Perfilado de las exportaciones ("--profile").
+
+Atribuye el tiempo real y el pico de memoria asignada (tracemalloc) a fases con
+nombre: connect, fetch, decode, transform, serialize, write, etc. Además corre
+cProfile sobre el hilo principal y sobre cada hilo de trabajo (desde Python 3.12
+un solo perfil cubre todos los hilos), y al terminar guarda un reporte de texto
+y un archivo .pstats en la carpeta "profiling".
+
+Sin "--profile" las fases no hacen nada, así que el costo de instrumentar el
+código es despreciable.
+"""
+
+import os
+import io
+import sys
+import time
+import logging
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from datetime import datetime
+
+# Desde Python 3.12 cProfile usa sys.monitoring: un perfil activo ya registra todos los
+# hilos y no se puede activar un segundo perfil a la vez.
+_PROCESS_WIDE_PROFILE = sys.version_info >= (3, 12)
+
+
+class _NullPhase:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class _Phase:
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.local = threading.local()
+
+    def __enter__(self):
+        # El pico de tracemalloc es global: se reinicia al entrar en cada fase. Con
+        # varios hilos en paralelo los picos por fase son aproximados.
+        tracemalloc.reset_peak()
+        self.local.start_memory = tracemalloc.get_traced_memory()[0]
+        self.local.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.local.start
+        current, peak = tracemalloc.get_traced_memory()
+        self.profiler.record(self.name, elapsed, max(peak - self.local.start_memory, 0), peak)
+        return False
+
+
+class PhaseProfiler:
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.phases = {}
+        self.stats = {}
+        self.profiles = []
+        self.peak_memory = 0
+        self.start_time = None
+        self.main_profile = None
+
+    def start(self):
+        if not self.enabled:
+            return
+        tracemalloc.start()
+        self.start_time = time.perf_counter()
+        self.main_profile = self._enable_profile()
+
+    @staticmethod
+    def _enable_profile():
+        # Si otra herramienta ya está perfilando (un depurador, por ejemplo), se sigue sin cProfile.
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            logging.warning(f"No se pudo activar cProfile: {e}")
+            return None
+        return profile
+
+    def phase(self, name):
+        """Context manager que suma el tiempo y la memoria del bloque a la fase `name`."""
+        if not self.enabled:
+            return _NULL_PHASE
+        with self.lock:
+            if name not in self.phases:
+                self.phases[name] = _Phase(self, name)
+                self.stats[name] = {'llamadas': 0, 'segundos': 0.0, 'pico_bytes': 0}
+            return self.phases[name]
+
+    def record(self, name, elapsed, phase_peak, total_peak):
+        with self.lock:
+            stats = self.stats[name]
+            stats['llamadas'] += 1
+            stats['segundos'] += elapsed
+            stats['pico_bytes'] = max(stats['pico_bytes'], phase_peak)
+            self.peak_memory = max(self.peak_memory, total_peak)
+
+    def wrap(self, func):
+        """Envuelve una función que corre en un hilo de trabajo para incluirla en cProfile."""
+        if not self.enabled or _PROCESS_WIDE_PROFILE:
+            return func
+
+        def profiled(*args, **kwargs):
+            profile = self._enable_profile()
+            if profile is None:
+                return func(*args, **kwargs)
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.disable()
+                with self.lock:
+                    self.profiles.append(profile)
+        return profiled
+
+    def stop(self, name):
+        """Detiene el perfilado y guarda profiling/<name>-<fecha>.txt y .pstats. Retorna la ruta del reporte."""
+        if not self.enabled:
+            return None
+        if self.main_profile:
+            self.main_profile.disable()
+        total_time = time.perf_counter() - self.start_time
+        self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+        os.makedirs('profiling', exist_ok=True)
+        prefix = os.path.join('profiling', f"{name}-{datetime.now().strftime('%Y%m%d-%H%M%S')}")
+        profiles = [profile for profile in [self.main_profile] + self.profiles if profile]
+        if profiles:
+            stats = pstats.Stats(*profiles)
+            stats.dump_stats(f"{prefix}.pstats")
+
+        lines = [
+            f"Tiempo total: {total_time:.3f} s",
+            f"Pico de memoria asignada: {self.peak_memory / 1024 / 1024:.1f} MB",
+            "",
+            "Tiempo por fase (sumado entre hilos; puede superar el total con concurrencia):",
+            f"{'fase':<12} {'llamadas':>10} {'segundos':>10} {'% total':>8} {'pico MB':>9}",
+        ]
+        for phase_name, phase_stats in sorted(self.stats.items(), key=lambda item: -item[1]['segundos']):
+            lines.append(
+                f"{phase_name:<12} {phase_stats['llamadas']:>10} {phase_stats['segundos']:>10.3f} "
+                f"{100 * phase_stats['segundos'] / total_time if total_time else 0:>7.1f}% "
+                f"{phase_stats['pico_bytes'] / 1024 / 1024:>9.1f}"
+            )
+
+        if profiles:
+            output = io.StringIO()
+            pstats.Stats(f"{prefix}.pstats", stream=output).sort_stats('cumulative').print_stats(30)
+            lines += ["", "Funciones con más tiempo acumulado (cProfile):", output.getvalue()]
+
+        with open(f"{prefix}.txt", 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines))
+        return f"{prefix}.txt"